@@ -0,0 +1,97 @@
+"""Latency of supervisor assignment under contention.
+
+Run from the app directory:  python -m bench.bench_assignment [--students 300] [--capacity 25] [--threads 32]
+
+Every student tries to grab a slot of the same supervisor at the same time, once with the
+previous read-check-write implementation and once with crud.students.choose_supervisor.
+Results (latencies in ms) are printed as JSON; tests/test_assignment.py checks that no more slots
+than the supervisor has are handed out.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import Base
+from models import Student, Supervisor
+from crud import students
+from bench.seed import seed
+
+# The implementation before the atomic UPDATE, kept for comparison
+def legacy_choose_supervisor(db: Session, student_id: int, supervisor_id: int) -> Student:
+    db_student = db.query(Student).filter(Student.id == student_id).first()
+    db_supervisor = db.query(Supervisor).filter(Supervisor.id == supervisor_id).first()
+    if db_student.supervisor_id == supervisor_id:
+        raise HTTPException(status_code=400, detail="Supervisor already assigned to this student")
+    if db_supervisor.availability <= 0:
+        raise HTTPException(status_code=400, detail="Supervisor is not available")
+    db_supervisor.availability -= 1
+    db_student.supervisor_id = supervisor_id
+    db.commit()
+    db.refresh(db_student)
+    db.refresh(db_supervisor)
+    return db_student
+
+def run(choose, args) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30}, pool_size=args.threads)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(session_factory, supervisors=1, students=args.students, capacity=args.capacity, assigned=False)
+
+    def attempt(student_id: int):
+        start = time.perf_counter()
+        with session_factory() as db:
+            try:
+                choose(db, student_id, 1)
+                ok = True
+            except HTTPException:
+                ok = False
+        return ok, (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(attempt, range(1, args.students + 1)))
+        elapsed = time.perf_counter() - start
+
+    with session_factory() as db:
+        assigned = db.scalar(select(func.count()).select_from(Student).where(Student.supervisor_id == 1))
+        availability = db.scalar(select(Supervisor.availability).where(Supervisor.id == 1))
+    engine.dispose()
+
+    latencies = sorted(latency for _, latency in results)
+    return {
+        "granted": sum(ok for ok, _ in results),
+        "students_assigned": assigned,
+        "availability_left": availability,
+        "over_allocated": max(0, assigned - args.capacity),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "seconds": round(elapsed, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--capacity", type=int, default=25)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    result = {
+        "students": args.students,
+        "capacity": args.capacity,
+        "threads": args.threads,
+        "before_read_check_write": run(legacy_choose_supervisor, args),
+        "after_conditional_update": run(students.choose_supervisor, args),
+    }
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Query count and latency of expanded listings, compared with lazy loading.
+
+Run from the app directory:  python -m bench.bench_expand [--students 2000]
+
+For each page size the expanded listings are compared with the lazy variant (serializing
+relationships without eager loading). Results are printed as JSON; tests/test_expand.py checks
+that the expanded query count does not depend on the page size.
+"""
+import argparse
+import json
+import time
+
+from sqlalchemy import event
+
+from bench.seed import memory_session_factory, seed
+from schemas import StudentExpanded, SupervisorExpanded
+from crud import students, supervisors
+from crud.relations import STUDENT_EXPANSIONS, student_options, supervisor_options
+
+def measure(session_factory, counter: list, load) -> dict:
+    with session_factory() as db:
+        counter[0] = 0
+        start = time.perf_counter()
+        load(db)
+        return {"queries": counter[0], "ms": round((time.perf_counter() - start) * 1000, 2)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    args = parser.parse_args()
+
+    session_factory = memory_session_factory()
+    seed(session_factory, supervisors=200, students=args.students)
+    counter = [0]
+    event.listen(session_factory.kw["bind"], "before_cursor_execute", lambda *_: counter.__setitem__(0, counter[0] + 1))
+
+    expanded = set(STUDENT_EXPANSIONS)
+    results = {}
+    for limit in (10, 100, 1000):
+        results[limit] = {
+            "students_lazy": measure(session_factory, counter, lambda db: [
+                StudentExpanded.model_validate(row) for row in students.get_all(db, limit=limit)]),
+            "students_expanded": measure(session_factory, counter, lambda db: [
+                StudentExpanded.model_validate(row) for row in students.get_all(db, limit=limit, options=student_options(expanded))]),
+            "supervisors_expanded": measure(session_factory, counter, lambda db: [
+                SupervisorExpanded.model_validate(row) for row in supervisors.get_all(db, limit=min(limit, 200), options=supervisor_options({"students"}))]),
+        }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Login verification throughput: inline bcrypt vs the bounded hashing pool.
+
+Run from the app directory:  python -m bench.bench_hashing [--logins 200] [--concurrency 40]
+
+"before" verifies inline on request threads (the old crud.students.verify_password),
+"after" routes the same calls through crud.hashing. Results are printed as JSON.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from crud import hashing
+
+def run(verify, logins: int, concurrency: int, hashed: str) -> dict:
+    rejected = []
+
+    def one(_):
+        try:
+            verify("correct horse", hashed)
+        except HTTPException:
+            rejected.append(1)
+
+    # Emulates the request threadpool: every request thread performs one login
+    with ThreadPoolExecutor(max_workers=concurrency) as requests:
+        start = time.perf_counter()
+        list(requests.map(one, range(logins)))
+        elapsed = time.perf_counter() - start
+    served = logins - len(rejected)
+    return {
+        "logins_per_sec": round(served / elapsed, 1),
+        "logins_per_sec_per_core": round(served / elapsed / (os.cpu_count() or 1), 1),
+        "rejected_503": len(rejected),
+        "seconds": round(elapsed, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=40)
+    args = parser.parse_args()
+
+    hashed = hashing.pwd_context.hash("correct horse")
+    result = {
+        "bcrypt_rounds": hashing.BCRYPT_ROUNDS,
+        "hash_workers": hashing.HASH_WORKERS,
+        "hash_queue_size": hashing.HASH_QUEUE_SIZE,
+        "cores": os.cpu_count(),
+        "before_inline": run(hashing.pwd_context.verify, args.logins, args.concurrency, hashed),
+        "after_pool": run(hashing.verify_password, args.logins, args.concurrency, hashed),
+    }
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
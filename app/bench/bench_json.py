@@ -0,0 +1,88 @@
+"""Throughput of the list endpoints with and without the FAST_JSON serialization path.
+
+Run from the app directory:  python -m bench.bench_json [--requests 200]
+
+A SQLite database is seeded once, then the app is started twice in a subprocess (FAST_JSON=0
+and FAST_JSON=1, catalog cache disabled) and /api/students/ and /api/supervisors/ are requested
+in-process with page sizes 10, 100 and 1000. Requests per second are printed as JSON.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+
+from database import Base
+from models import Student, Supervisor
+
+PAGE_SIZES = (10, 100, 1000)
+ENDPOINTS = ("/api/students/", "/api/supervisors/")
+
+def seed(url: str, rows: int):
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Supervisor), [
+            {"full_name": f"Supervisor {i}", "speciality": "AI", "availability": 3} for i in range(1, rows + 1)
+        ])
+        connection.execute(insert(Student), [
+            {"full_name": f"Student {i}", "email": f"student{i}@example.com", "hashed_password": "x", "is_active": 1,
+             "is_admin": int(i == 1), "supervisor_id": i % rows + 1}
+            for i in range(1, rows + 1)
+        ])
+    engine.dispose()
+
+# Runs inside the subprocess, with FAST_JSON and DATABASE_URL set in its environment
+def worker(requests: int) -> dict:
+    from fastapi.testclient import TestClient
+    from crud import auth
+    from main import app
+
+    headers = {"Authorization": "Bearer " + auth.sign_jwt(1, is_admin=True, is_active=True)["access_token"]}
+    results = {}
+    with TestClient(app) as client:
+        for endpoint in ENDPOINTS:
+            for limit in PAGE_SIZES:
+                client.get(endpoint, params={"limit": limit}, headers=headers).raise_for_status()
+                count = max(10, requests * 10 // limit)
+                start = time.perf_counter()
+                for _ in range(count):
+                    client.get(endpoint, params={"limit": limit}, headers=headers)
+                results[f"{endpoint} limit={limit}"] = round(count / (time.perf_counter() - start), 1)
+    return results
+
+def run(fast_json: str, url: str, requests: int) -> dict:
+    env = dict(os.environ, FAST_JSON=fast_json, DATABASE_URL=url, CACHE_BACKEND="none", METRICS_SAMPLE_RATE="0", RATE_LIMIT_ENABLED="0")
+    env.setdefault("SECRET", "bench-secret")
+    env.setdefault("ALGORITHM", "HS256")
+    output = subprocess.run(
+        [sys.executable, "-m", "bench.bench_json", "--worker", "--requests", str(requests)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint at page size 10 (scaled down for larger pages)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.requests)))
+        return
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    seed(url, max(PAGE_SIZES))
+    baseline = run("0", url, args.requests)
+    fast = run("1", url, args.requests)
+    print(json.dumps({
+        case: {"requests_per_second": baseline[case], "fast_json_requests_per_second": fast[case], "speedup": round(fast[case] / baseline[case], 2)}
+        for case in baseline
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
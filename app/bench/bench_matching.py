@@ -0,0 +1,104 @@
+"""Benchmark of the batch matching endpoint logic on a large intake.
+
+Run from the app directory:  python -m bench.bench_matching [--students 50000] [--supervisors 5000] [--choices 5]
+
+Students rank a few supervisors and memory masters drawn with a skew towards popular ones, then
+crud.matching.run computes and applies the whole assignment in one transaction on a file-backed
+SQLite database. Results (timings in seconds) are printed as JSON; the run fails if any
+supervisor or memory master ends up over capacity.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Student, Supervisor, MemoryMaster
+from schemas import MatchingRequest, StudentPreferences
+from crud import matching
+
+def seed(session_factory, args):
+    with session_factory() as db:
+        db.execute(insert(Supervisor), [
+            {"id": i, "full_name": f"Supervisor {i}", "speciality": "AI", "availability": 1 + i % 5}
+            for i in range(1, args.supervisors + 1)
+        ])
+        db.execute(insert(MemoryMaster), [
+            {"id": i, "full_name": f"Memory master {i}", "speciality": "AI", "availability": True}
+            for i in range(1, args.students + 1)
+        ])
+        db.execute(insert(Student), [
+            {"id": i, "full_name": f"Student {i}", "email": f"student{i}@example.com", "hashed_password": "x", "is_active": 1, "is_admin": 0}
+            for i in range(1, args.students + 1)
+        ])
+        db.commit()
+
+# Half of the choices go to the most popular 5% of places, the rest uniformly
+def pick(rng: random.Random, count: int) -> int:
+    return rng.randint(1, max(1, count // 20)) if rng.random() < 0.5 else rng.randint(1, count)
+
+def preferences(args) -> MatchingRequest:
+    rng = random.Random(42)
+    return MatchingRequest(preferences=[
+        StudentPreferences(
+            student_id=student_id,
+            supervisors=list(dict.fromkeys(pick(rng, args.supervisors) for _ in range(args.choices))),
+            memory_masters=list(dict.fromkeys(pick(rng, args.students) for _ in range(args.choices))),
+        )
+        for student_id in range(1, args.students + 1)
+    ])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=50000)
+    parser.add_argument("--supervisors", type=int, default=5000)
+    parser.add_argument("--choices", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(session_factory, args)
+    request = preferences(args)
+
+    with session_factory() as db:
+        start = time.perf_counter()
+        planned = matching.run(db, request.model_copy(update={"dry_run": True}))
+        compute_seconds = time.perf_counter() - start
+    with session_factory() as db:
+        start = time.perf_counter()
+        result = matching.run(db, request)
+        total_seconds = time.perf_counter() - start
+
+    with session_factory() as db:
+        over_capacity = db.scalar(select(func.count()).select_from(Supervisor).where(Supervisor.availability < 0))
+        per_supervisor = select(Student.supervisor_id, func.count().label("assigned")).where(Student.supervisor_id.is_not(None)).group_by(Student.supervisor_id).subquery()
+        over_capacity += db.scalar(
+            select(func.count()).select_from(per_supervisor).where(per_supervisor.c.assigned > 1 + per_supervisor.c.supervisor_id % 5)
+        )
+        per_memory_master = select(Student.memory_master_id).where(Student.memory_master_id.is_not(None)).group_by(Student.memory_master_id).having(func.count() > 1)
+        over_capacity += db.scalar(select(func.count()).select_from(per_memory_master.subquery()))
+    engine.dispose()
+
+    print(json.dumps({
+        "students": args.students,
+        "supervisors": args.supervisors,
+        "supervisor_capacity": sum(1 + i % 5 for i in range(1, args.supervisors + 1)),
+        "supervisors_assigned": result.supervisors_assigned,
+        "memory_masters_assigned": result.memory_masters_assigned,
+        "unmatched": len(result.unmatched),
+        "compute_seconds": round(compute_seconds, 3),
+        "compute_and_apply_seconds": round(total_seconds, 3),
+        "over_capacity": over_capacity,
+    }, indent=2))
+    assert planned.supervisors_assigned == result.supervisors_assigned, "dry run and applied matching differ"
+    assert over_capacity == 0, "capacity exceeded"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Startup time of the EduMaster API: cold import of main.app and time to first request.
+
+Run from the app directory:  python -m bench.bench_startup [--runs 5]
+
+Each run is a fresh interpreter. "import" is the time to `import main` (no server, no database).
+"first_request" starts uvicorn on a free port and measures from process spawn until GET
+/api/supervisors/ answers:
+
+    empty_db        DB_AUTO_MIGRATE=1, the lifespan creates the schema
+    migrated_db     DB_AUTO_MIGRATE=1 on an up-to-date database (version check only)
+    no_auto_migrate DB_AUTO_MIGRATE=0, schema migrated beforehand by `python migrate.py`
+
+Medians in milliseconds are printed as JSON; USE_ASYNC_DB and the other settings are taken
+from the environment.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+os.environ.setdefault("SECRET", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from crud import auth
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+def environment(path: str, auto_migrate: str = "1") -> dict:
+    return dict(
+        os.environ, DATABASE_URL=f"sqlite:///{path}", ASYNC_DATABASE_URL=f"sqlite+aiosqlite:///{path}", DB_AUTO_MIGRATE=auto_migrate,
+    )
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def import_seconds(path: str) -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=environment(path), check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+def first_request_seconds(path: str, auto_migrate: str = "1") -> float:
+    headers = {"Authorization": "Bearer " + auth.sign_jwt(1, is_admin=False, is_active=True)["access_token"]}
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=environment(path, auto_migrate),
+    )
+    try:
+        while time.perf_counter() - start < 60:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/api/supervisors/", headers=headers).raise_for_status()
+                return time.perf_counter() - start
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        raise SystemExit("Server did not start")
+    finally:
+        server.terminate()
+        server.wait()
+
+def median_ms(samples: list[float]) -> float:
+    return round(statistics.median(samples) * 1000, 1)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    samples = {"import": [], "first_request_empty_db": [], "first_request_migrated_db": [], "first_request_no_auto_migrate": []}
+    for run in range(args.runs):
+        path = os.path.join(directory, f"startup{run}.db")
+        samples["import"].append(import_seconds(path))
+        samples["first_request_empty_db"].append(first_request_seconds(path))
+        samples["first_request_migrated_db"].append(first_request_seconds(path))
+        samples["first_request_no_auto_migrate"].append(first_request_seconds(path, auto_migrate="0"))
+    print(json.dumps({"runs": args.runs, **{f"{name}_ms": median_ms(values) for name, values in samples.items()}}, indent=2))
+
+if __name__ == "__main__":
+    main()
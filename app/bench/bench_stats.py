@@ -0,0 +1,110 @@
+"""Benchmark of /stats: maintained counters against the GROUP BY queries.
+
+Run from the app directory:  python -m bench.bench_stats [--students 200000] [--supervisors 2000] [--specialities 20] [--reads 200]
+
+Students, supervisors and memory masters are seeded in a file-backed SQLite database and the
+counters rebuilt, then crud.stats.read (the counters) and crud.stats.compute (GROUP BY over the
+tables) are timed; a few hundred assignments follow through crud.students to time the write
+path that moves the counters. Results (latencies in ms) are printed as JSON; the run fails if
+the counters and the GROUP BY queries disagree.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Student, Supervisor, MemoryMaster
+from crud import stats, students
+
+def seed(session_factory, args):
+    rng = random.Random(42)
+    with session_factory() as db:
+        db.execute(insert(Supervisor), [
+            {"id": i, "full_name": f"Supervisor {i}", "speciality": f"Speciality {i % args.specialities}", "availability": 1 + i % 5}
+            for i in range(1, args.supervisors + 1)
+        ])
+        db.execute(insert(MemoryMaster), [
+            {"id": i, "full_name": f"Memory master {i}", "speciality": f"Speciality {i % args.specialities}", "availability": i % 3 != 0}
+            for i in range(1, args.supervisors + 1)
+        ])
+        for start in range(1, args.students + 1, 10000):
+            db.execute(insert(Student), [
+                {
+                    "id": i, "full_name": f"Student {i}", "email": f"student{i}@example.com", "hashed_password": "x",
+                    "is_active": 1, "is_admin": 0,
+                    "supervisor_id": rng.randint(1, args.supervisors) if i % 2 else None,
+                    "memory_master_id": rng.randint(1, args.supervisors) if i % 3 == 0 else None,
+                }
+                for i in range(start, min(start + 10000, args.students + 1))
+            ])
+        stats.rebuild(db)
+
+def timed(session_factory, function, repeat: int) -> list[float]:
+    latencies = []
+    with session_factory() as db:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(db)
+            latencies.append((time.perf_counter() - start) * 1000)
+            db.rollback()
+    return latencies
+
+def summary(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "median_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=200000)
+    parser.add_argument("--supervisors", type=int, default=2000)
+    parser.add_argument("--specialities", type=int, default=20)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--assignments", type=int, default=300)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(session_factory, args)
+
+    counters = timed(session_factory, stats.read, args.reads)
+    group_by = timed(session_factory, stats.compute, max(1, args.reads // 10))
+
+    # Students without a supervisor (even ids) each claim a place
+    assignments, rejected = [], 0
+    with session_factory() as db:
+        for student_id in range(2, 2 * args.assignments + 1, 2):
+            start = time.perf_counter()
+            try:
+                students.choose_supervisor(db, student_id, 1 + student_id % args.supervisors)
+            except HTTPException:
+                rejected += 1
+            assignments.append((time.perf_counter() - start) * 1000)
+        consistent = stats.read(db) == stats.compute(db)
+    engine.dispose()
+
+    print(json.dumps({
+        "students": args.students,
+        "supervisors": args.supervisors,
+        "specialities": args.specialities,
+        "counters": summary(counters),
+        "group_by": summary(group_by),
+        "choose_supervisor": {**summary(assignments), "rejected": rejected},
+        "consistent": consistent,
+    }, indent=2))
+    assert consistent, "counters differ from the GROUP BY queries"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Read scaling of the multi-worker mode (serve.py) across worker counts.
+
+Run from the app directory:  python -m bench.bench_workers [--workers 1,2,4] [--requests 4000]
+    [--clients 4] [--concurrency 32]
+
+A SQLite (WAL) database is seeded as in bench.loadtest, then for each worker count serve.py is
+started with WEB_CONCURRENCY set to it and hit by --clients client processes:
+
+    read_single   GET /api/supervisors/{id}
+    read_list     GET /api/supervisors/?limit=50 at random offsets
+    write         PATCH /api/supervisors/{id}, contending for the SQLite write lock
+
+CACHE_BACKEND defaults to none so every read reaches the database. Per worker count and scenario
+the JSON output gives RPS, status counts and p50/p95/p99 latency in ms, plus the scaling
+efficiency of reads: RPS / (workers x RPS with one worker), 1.0 being linear. Writes to SQLite
+serialize whatever the worker count; their statuses show lock contention (503 after retries).
+Scaling is bounded by the cores left to the clients, so use a machine with spare cores.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+os.environ.setdefault("CACHE_BACKEND", "none")
+
+from bench.loadtest import seed, free_port, summarize, token_headers
+from serve import available_cpus
+
+def start_serve(path: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(
+        os.environ, WEB_CONCURRENCY=str(workers), HOST="127.0.0.1", PORT=str(port),
+        DATABASE_URL=f"sqlite:///{path}", ASYNC_DATABASE_URL=f"sqlite+aiosqlite:///{path}",
+    )
+    server = subprocess.Popen([sys.executable, "serve.py"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/metrics").raise_for_status()
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("Server did not start")
+
+def scenario_requests(name: str, count: int, args, seed_value: int) -> list[tuple]:
+    rng = random.Random(seed_value)
+    headers = token_headers(1, is_admin=True)
+    if name == "read_single":
+        return [("GET", f"/api/supervisors/{rng.randint(1, args.supervisors)}", {"headers": headers}) for _ in range(count)]
+    if name == "read_list":
+        return [("GET", f"/api/supervisors/?skip={rng.randint(0, args.supervisors - 50)}&limit=50", {"headers": headers}) for _ in range(count)]
+    return [
+        ("PATCH", f"/api/supervisors/{rng.randint(1, args.supervisors)}", {"headers": headers, "json": {"full_name": f"Renamed {i}"}})
+        for i in range(count)
+    ]
+
+async def send_all(base_url: str, requests: list[tuple], concurrency: int) -> list[tuple[int, float]]:
+    slots = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def send(client: httpx.AsyncClient, method: str, path: str, kwargs: dict):
+        async with slots:
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            results.append((response.status_code, (time.perf_counter() - start) * 1000))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=concurrency)) as client:
+        await asyncio.gather(*(send(client, *request) for request in requests))
+    return results
+
+# One client process: its share of the requests, with its share of the concurrency
+def client(base_url: str, name: str, count: int, concurrency: int, args, seed_value: int) -> list[tuple[int, float]]:
+    return asyncio.run(send_all(base_url, scenario_requests(name, count, args, seed_value), concurrency))
+
+def run_scenario(pool: ProcessPoolExecutor, base_url: str, name: str, args) -> dict:
+    per_client = args.requests // args.clients
+    concurrency = max(1, args.concurrency // args.clients)
+    start = time.perf_counter()
+    futures = [pool.submit(client, base_url, name, per_client, concurrency, args, index) for index in range(args.clients)]
+    results = [result for future in futures for result in future.result()]
+    return summarize(results, time.perf_counter() - start)
+
+# 1, 2, 4... up to the available cores
+def default_workers(cpus: int) -> str:
+    counts = [1]
+    while counts[-1] * 2 <= max(2, cpus):
+        counts.append(counts[-1] * 2)
+    return ",".join(str(count) for count in counts)
+
+def main():
+    cpus = available_cpus()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default=default_workers(cpus))
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--supervisors", type=int, default=2000)
+    parser.add_argument("--memory-masters", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=4000, help="requests per scenario")
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight, over all clients")
+    parser.add_argument("--scenarios", default="read_single,read_list,write")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    seed(f"sqlite:///{path}", args)
+    runs = {}
+    with ProcessPoolExecutor(max_workers=args.clients) as pool:
+        for workers in [int(value) for value in args.workers.split(",")]:
+            port = free_port()
+            server = start_serve(path, port, workers)
+            try:
+                runs[workers] = {name: run_scenario(pool, f"http://127.0.0.1:{port}", name, args) for name in args.scenarios.split(",")}
+            finally:
+                server.terminate()
+                server.wait()
+
+    baseline = runs[min(runs)]
+    for workers, scenarios in runs.items():
+        for name, result in scenarios.items():
+            if name.startswith("read") and baseline[name]["rps"]:
+                result["scaling_efficiency"] = round(result["rps"] / (workers / min(runs) * baseline[name]["rps"]), 2)
+
+    print(json.dumps({
+        "cpus": cpus,
+        "config": {"requests": args.requests, "clients": args.clients, "concurrency": args.concurrency, "cache_backend": os.environ["CACHE_BACKEND"]},
+        "workers": runs,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
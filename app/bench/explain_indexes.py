@@ -0,0 +1,68 @@
+"""EXPLAIN QUERY PLAN of the filtered listings, to see which indexes serve them.
+
+Run from the app directory:  python -m bench.explain_indexes [--rows 5000]
+
+Each filtered listing is executed against a seeded in-memory SQLite database, its statements are
+captured and explained with the same parameters. Plans are printed as JSON, with whether each
+uses the index it is meant to; tests/test_indexes.py checks that they all do.
+"""
+import argparse
+import json
+
+from sqlalchemy import event
+
+from bench.seed import SPECIALITIES, memory_session_factory, seed
+from schemas import CatalogFilters, StudentFilters
+from crud import students, supervisors, memory_masters
+
+# (name, listing, index expected in the plan)
+CASES = [
+    ("supervisors speciality+available", lambda db: supervisors.get_all_rows(db, filters=CatalogFilters(speciality=["AI"], available=True)),
+     "ix_supervisors_speciality_availability"),
+    ("supervisors speciality in", lambda db: supervisors.get_page_rows(db, filters=CatalogFilters(speciality=["AI", "Security"])),
+     "ix_supervisors_speciality_availability"),
+    ("supervisors name prefix", lambda db: supervisors.get_all_rows(db, filters=CatalogFilters(search="Supervisor 12", sort="full_name")),
+     "ix_supervisors_full_name"),
+    ("memory masters speciality+available", lambda db: memory_masters.get_page_rows(db, filters=CatalogFilters(speciality=["Networks"], available=True)),
+     "ix_memory_masters_speciality_availability"),
+    ("students by supervisor", lambda db: students.get_all(db, filters=StudentFilters(supervisor_id=7)),
+     "ix_students_supervisor_id"),
+    ("students by memory master", lambda db: students.get_page(db, filters=StudentFilters(memory_master_id=7)),
+     "ix_students_memory_master_id"),
+    ("students name prefix", lambda db: students.get_all(db, filters=StudentFilters(search="Student 42", sort="full_name")),
+     "ix_students_full_name"),
+]
+
+# The plan of the first statement a listing executes
+def explain(session_factory, listing) -> list[str]:
+    engine = session_factory.kw["bind"]
+    captured = []
+    capture = lambda conn, cursor, statement, parameters, context, executemany: captured.append((statement, parameters))
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        with session_factory() as db:
+            listing(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    statement, parameters = captured[0]
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    session_factory = memory_session_factory()
+    seed(session_factory, supervisors=args.rows, students=args.rows * 4, specialities=len(SPECIALITIES))
+    with session_factory.kw["bind"].connect() as connection:
+        connection.exec_driver_sql("ANALYZE")
+
+    results = []
+    for name, listing, index in CASES:
+        plan = explain(session_factory, listing)
+        results.append({"case": name, "index": index, "used": any(index in step for step in plan), "plan": plan})
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Load test of the EduMaster API, for comparing performance across commits.
+
+Run from the app directory:  python -m bench.loadtest [--students 5000] [--supervisors 500]
+    [--memory-masters 500] [--requests 500] [--concurrency 16] [--output results.json]
+
+A SQLite database is seeded with synthetic data, main.app is started with uvicorn on a free local
+port (USE_ASYNC_DB, FAST_JSON, CACHE_BACKEND... are passed through from the environment) and
+each scenario is run with --concurrency clients in flight:
+
+    register                       POST /api/register/ with new students
+    login                          POST /api/login/ with seeded students
+    supervisors_skip_{0,mid,deep}  GET /api/supervisors/ at increasing offsets
+    supervisors_cursor_deep        GET /api/supervisors/ with a cursor near the end
+    students_skip_{0,mid,deep}     GET /api/students/ (admin) at increasing offsets
+    students_cursor_deep           GET /api/students/ with a cursor near the end
+    choose_supervisor_contention   every student claims one of a few hot supervisors at once
+
+Per scenario the JSON output gives requests, status counts, RPS and p50/p95/p99 latency in ms,
+along with the configuration and the git commit it ran on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+os.environ.setdefault("SECRET", "loadtest-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+# Every request comes from 127.0.0.1 and a few users: measure the endpoints, not the limiter
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+from database import Base
+from models import Student, Supervisor, MemoryMaster
+from crud import auth
+from crud.hashing import pwd_context
+from crud.pagination import encode_cursor
+
+PASSWORD = "loadtest-password"
+
+def seed(url: str, args):
+    # One bcrypt hash shared by every student: seeding stays fast, logins still pay the full cost
+    hashed_password = pwd_context.hash(PASSWORD)
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Supervisor), [
+            {"id": i, "full_name": f"Supervisor {i}", "speciality": f"Speciality {i % 20}", "availability": 3}
+            for i in range(1, args.supervisors + 1)
+        ])
+        connection.execute(insert(MemoryMaster), [
+            {"id": i, "full_name": f"Memory master {i}", "speciality": f"Speciality {i % 20}", "availability": True}
+            for i in range(1, args.memory_masters + 1)
+        ])
+        connection.execute(insert(Student), [
+            {"id": i, "full_name": f"Student {i}", "email": f"student{i}@example.com", "hashed_password": hashed_password,
+             "is_active": 1, "is_admin": int(i == 1)}
+            for i in range(1, args.students + 1)
+        ])
+    engine.dispose()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(path: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", ASYNC_DATABASE_URL=f"sqlite+aiosqlite:///{path}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/metrics").raise_for_status()
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("Server did not start")
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def token_headers(student_id: int, is_admin: bool = False) -> dict:
+    return {"Authorization": "Bearer " + auth.sign_jwt(student_id, is_admin=is_admin, is_active=True)["access_token"]}
+
+def summarize(results: list[tuple[int, float]], seconds: float) -> dict:
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(results),
+        "statuses": statuses,
+        "rps": round(len(results) / seconds, 1),
+        "p50_ms": round(quantiles[49], 2),
+        "p95_ms": round(quantiles[94], 2),
+        "p99_ms": round(quantiles[98], 2),
+    }
+
+# Sends the requests with at most `concurrency` in flight; each request is (method, path, kwargs)
+async def run_scenario(client: httpx.AsyncClient, requests: list[tuple], concurrency: int) -> dict:
+    slots = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def send(method: str, path: str, kwargs: dict):
+        async with slots:
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            results.append((response.status_code, (time.perf_counter() - start) * 1000))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(*request) for request in requests))
+    return summarize(results, time.perf_counter() - start)
+
+def scenarios(args) -> dict[str, list[tuple]]:
+    rng = random.Random(42)
+    admin = token_headers(1, is_admin=True)
+    user = token_headers(2)
+    count = args.requests
+    depths = {"0": 0, "mid": args.supervisors // 2, "deep": max(0, args.supervisors - args.page_size)}
+    student_depths = {"0": 0, "mid": args.students // 2, "deep": max(0, args.students - args.page_size)}
+    plan = {
+        "register": [
+            ("POST", "/api/register/", {"json": {"full_name": f"New student {i}", "email": f"new{i}@example.com", "password": PASSWORD}})
+            for i in range(count)
+        ],
+        "login": [
+            ("POST", "/api/login/", {"json": {"email": f"student{rng.randint(2, args.students)}@example.com", "password": PASSWORD}})
+            for _ in range(count)
+        ],
+    }
+    for name, skip in depths.items():
+        plan[f"supervisors_skip_{name}"] = [("GET", "/api/supervisors/", {"params": {"skip": skip, "limit": args.page_size}, "headers": user})] * count
+    plan["supervisors_cursor_deep"] = [
+        ("GET", "/api/supervisors/", {"params": {"cursor": encode_cursor([depths["deep"]]), "limit": args.page_size}, "headers": user})
+    ] * count
+    for name, skip in student_depths.items():
+        plan[f"students_skip_{name}"] = [("GET", "/api/students/", {"params": {"skip": skip, "limit": args.page_size}, "headers": admin})] * count
+    plan["students_cursor_deep"] = [
+        ("GET", "/api/students/", {"params": {"cursor": encode_cursor([student_depths["deep"]]), "limit": args.page_size}, "headers": admin})
+    ] * count
+    # Distinct students racing for the few slots of the hot supervisors
+    hot = range(1, min(args.hot_supervisors, args.supervisors) + 1)
+    plan["choose_supervisor_contention"] = [
+        ("POST", f"/api/students/me/choose_supervisor/{rng.choice(hot)}", {"headers": token_headers(student_id)})
+        for student_id in range(2, min(count, args.students - 1) + 2)
+    ]
+    return plan
+
+async def run_all(base_url: str, args) -> dict:
+    plan = scenarios(args)
+    selected = args.scenarios.split(",") if args.scenarios else list(plan)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        for name in selected:
+            results[name] = await run_scenario(client, plan[name], args.concurrency)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--supervisors", type=int, default=500)
+    parser.add_argument("--memory-masters", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--hot-supervisors", type=int, default=5)
+    parser.add_argument("--scenarios", help="comma-separated subset of scenarios to run")
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "loadtest.db")
+    seed(f"sqlite:///{path}", args)
+    port = free_port()
+    server = start_server(path, port)
+    try:
+        results = asyncio.run(run_all(f"http://127.0.0.1:{port}", args))
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        "commit": git_commit(),
+        "config": {
+            "students": args.students, "supervisors": args.supervisors, "memory_masters": args.memory_masters,
+            "requests": args.requests, "concurrency": args.concurrency, "page_size": args.page_size,
+            "env": {name: os.environ[name] for name in ("USE_ASYNC_DB", "FAST_JSON", "CACHE_BACKEND", "BCRYPT_ROUNDS", "RATE_LIMIT_ENABLED") if name in os.environ},
+        },
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import Student, Supervisor, MemoryMaster
+
+# Seed data shared by the benchmarks and the tests
+
+SPECIALITIES = ["AI", "Networks", "Security", "Databases", "Systems"] + [f"Speciality {i}" for i in range(35)]
+
+# An in-memory SQLite database with the schema, on a single connection shared by all sessions
+def memory_session_factory() -> sessionmaker:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# supervisors supervisors and as many memory masters over the first specialities, with
+# availability i % 4 (supervisors) and i % 2 == 0 (memory masters) unless capacity is set, and
+# students assigned round robin to both unless assigned is False
+def seed(session_factory, supervisors: int, students: int, specialities: int = 1, capacity: int | None = None, assigned: bool = True):
+    with session_factory() as db:
+        db.execute(insert(Supervisor), [
+            {"full_name": f"Supervisor {i}", "speciality": SPECIALITIES[i % specialities], "availability": i % 4 if capacity is None else capacity}
+            for i in range(1, supervisors + 1)
+        ])
+        db.execute(insert(MemoryMaster), [
+            {"full_name": f"Memory master {i}", "speciality": SPECIALITIES[i % specialities], "availability": i % 2 == 0 if capacity is None else True}
+            for i in range(1, supervisors + 1)
+        ])
+        db.execute(insert(Student), [
+            {"full_name": f"Student {i}", "email": f"student{i}@example.com", "hashed_password": "x", "is_active": 1, "is_admin": 0,
+             "supervisor_id": i % supervisors + 1 if assigned else None, "memory_master_id": i % supervisors + 1 if assigned else None}
+            for i in range(1, students + 1)
+        ])
+        db.commit()
@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from database import shared_backend
+
+# Thread-safe LRU cache where every entry carries its own expiry time
+class LRUCache:
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at: float | None = None):
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# Read-through cache for hot catalog reads (supervisors, memory masters).
+#
+# Keys embed a per-namespace generation number; writers bump the generation after committing,
+# which invalidates every cached page of that namespace in O(1) on any backend. Readers that
+# raced with a write may store a stale value, but only under the old generation nobody reads again.
+#
+# CACHE_BACKEND: "memory" (per-process LRU), "redis" (REDIS_URL, shared between workers),
+# "fake-redis" (in-process stand-in for the redis client) or "none". The default is "memory" with
+# a single worker; with several, a write would only invalidate its own worker's copy, so it is
+# "redis" when REDIS_URL is set and "none" otherwise.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", shared_backend("none"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+class MemoryBackend:
+    def __init__(self, maxsize: int):
+        self._entries = LRUCache(maxsize=maxsize)
+        # Kept apart from the LRU: evicting a generation would resurrect stale entries
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        return self._entries.get(key)
+
+    def set(self, key: str, value, ttl: float):
+        self._entries.set(key, value, expires_at=time.time() + ttl)
+
+    def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+# Works with redis.Redis or any client exposing get/set(ex=)/incr
+class RedisBackend:
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str):
+        value = self.client.get(f"cache:{key}")
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, value, ttl: float):
+        self.client.set(f"cache:{key}", json.dumps(value), ex=max(1, int(ttl)))
+
+    def generation(self, namespace: str) -> int:
+        return int(self.client.get(f"cache-generation:{namespace}") or 0)
+
+    def bump(self, namespace: str):
+        self.client.incr(f"cache-generation:{namespace}")
+
+class NullBackend:
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, value, ttl: float):
+        pass
+
+    def generation(self, namespace: str) -> int:
+        return 0
+
+    def bump(self, namespace: str):
+        pass
+
+# In-process stand-in for the subset of the redis client used here (local runs and benchmarks)
+class FakeRedis:
+    def __init__(self):
+        self._data: dict[str, tuple[bytes, float | None]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value, ex: int | None = None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            self._data[key] = (value, time.time() + ex if ex else None)
+        return True
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value, expires_at = self._data.get(key, (b"0", None))
+            value = str(int(value) + 1).encode()
+            self._data[key] = (value, expires_at)
+            return int(value)
+
+class Cache:
+    def __init__(self, backend, ttl: float = CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{namespace}:{self.backend.generation(namespace)}:{key}"
+
+    # Return the cached value, or load and cache it. None results are not cached.
+    def get_or_load(self, namespace: str, key: str, loader):
+        full_key = self._key(namespace, key)
+        value = self.backend.get(full_key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.backend.set(full_key, value, self.ttl)
+        return value
+
+    async def get_or_load_async(self, namespace: str, key: str, loader):
+        full_key = self._key(namespace, key)
+        value = self.backend.get(full_key)
+        if value is None:
+            value = await loader()
+            if value is not None:
+                self.backend.set(full_key, value, self.ttl)
+        return value
+
+    # Call after the write is committed
+    def invalidate(self, *namespaces: str):
+        for namespace in namespaces:
+            self.backend.bump(namespace)
+
+def make_backend(name: str):
+    if name == "memory":
+        return MemoryBackend(CACHE_MAX_ENTRIES)
+    if name == "redis":
+        import redis  # optional dependency, only needed for the shared backend
+        return RedisBackend(redis.Redis.from_url(REDIS_URL))
+    if name == "fake-redis":
+        return RedisBackend(FakeRedis())
+    if name == "none":
+        return NullBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND {name!r}")
+
+catalog_cache = Cache(make_backend(CACHE_BACKEND))
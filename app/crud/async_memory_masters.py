@@ -0,0 +1,75 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import catalog_cache
+from crud.pagination import apply_keyset, keyset_order, split_page
+from crud.filtering import filters_key
+from crud.conditional import list_version, row_version
+from crud import memory_masters, stats
+from crud.memory_masters import CACHE_NAMESPACE
+from crud.bulk import BULK_BATCH_SIZE
+from crud.retry import retry_locked
+from models import MemoryMaster
+from schemas import MemoryMasterBase, MemoryMasterCreate, MemoryMasterUpdate, MemoryMasterPatch, BulkResult, CatalogFilters
+
+# Async CRUD operations for MemoryMaster
+async def get_all(db: AsyncSession, skip: int = 0, limit: int = 10, options: list = (), filters: CatalogFilters | None = None) -> list[MemoryMaster]:
+    where, keys = memory_masters.list_criteria(filters)
+    result = await db.execute(select(MemoryMaster).options(*options).where(*where).order_by(*keyset_order(keys)).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_page(db: AsyncSession, cursor: str = "", limit: int = 10, options: list = (), filters: CatalogFilters | None = None) -> tuple[list[MemoryMaster], str | None]:
+    where, keys = memory_masters.list_criteria(filters)
+    result = await db.execute(apply_keyset(select(MemoryMaster).options(*options).where(*where), keys, cursor, limit))
+    return split_page(result.scalars().all(), keys, limit)
+
+# Cached reads, loaded with the sync row readers through run_sync
+async def get_all_cached(db: AsyncSession, skip: int = 0, limit: int = 10, filters: CatalogFilters | None = None) -> list[dict]:
+    key = f"all:{skip}:{limit}:{filters_key(filters)}"
+    return await catalog_cache.get_or_load_async(CACHE_NAMESPACE, key, lambda: db.run_sync(memory_masters.get_all_rows, skip, limit, filters))
+
+async def get_page_cached(db: AsyncSession, cursor: str = "", limit: int = 10, filters: CatalogFilters | None = None) -> tuple[list[dict], str | None]:
+    key = f"page:{cursor}:{limit}:{filters_key(filters)}"
+    return await catalog_cache.get_or_load_async(CACHE_NAMESPACE, key, lambda: db.run_sync(memory_masters.get_page_rows, cursor, limit, filters))
+
+async def get_cached(db: AsyncSession, memory_master_id: int) -> dict | None:
+    return await catalog_cache.get_or_load_async(CACHE_NAMESPACE, f"get:{memory_master_id}", lambda: db.run_sync(memory_masters.get_row, memory_master_id))
+
+async def list_version_cached(db: AsyncSession) -> dict:
+    return await catalog_cache.get_or_load_async(CACHE_NAMESPACE, "version:list", lambda: db.run_sync(list_version, MemoryMaster))
+
+async def version_cached(db: AsyncSession, memory_master_id: int) -> dict | None:
+    return await catalog_cache.get_or_load_async(CACHE_NAMESPACE, f"version:{memory_master_id}", lambda: db.run_sync(row_version, MemoryMaster, memory_master_id))
+
+@retry_locked
+async def create(db: AsyncSession, memory_master: MemoryMasterCreate) -> MemoryMaster:
+    db_memory_master = MemoryMaster(
+        full_name=memory_master.full_name,
+        speciality=memory_master.speciality,
+    )
+    db.add(db_memory_master)
+    await db.flush()
+    await db.execute(stats.increment(db, stats.catalog_source(MemoryMaster, db_memory_master.id, 1)))
+    await db.commit()
+    catalog_cache.invalidate(CACHE_NAMESPACE)
+    await db.refresh(db_memory_master)
+    return db_memory_master
+
+async def bulk_create(db: AsyncSession, rows: list[dict], batch_size: int = BULK_BATCH_SIZE) -> BulkResult:
+    return await db.run_sync(memory_masters.bulk_create, rows, batch_size)
+
+async def get(db: AsyncSession, memory_master_id: int, options: list = ()) -> MemoryMaster:
+    return await db.get(MemoryMaster, memory_master_id, options=options)
+
+async def update(db: AsyncSession, memory_master_id: int, memory_master_update: MemoryMasterPatch) -> MemoryMaster:
+    return await db.run_sync(memory_masters.update, memory_master_id, memory_master_update)
+
+@retry_locked
+async def delete(db: AsyncSession, memory_master_id: int) -> MemoryMaster:
+    db_memory_master = await db.get(MemoryMaster, memory_master_id)
+    if not db_memory_master:
+        return None
+    await db.execute(stats.increment(db, stats.deletion_source(MemoryMaster, memory_master_id)))
+    await db.delete(db_memory_master)
+    await db.commit()
+    catalog_cache.invalidate(CACHE_NAMESPACE)
+    return db_memory_master
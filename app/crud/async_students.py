@@ -0,0 +1,151 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import catalog_cache
+from crud.auth import forget_user
+from crud import students, supervisors, memory_masters, stats
+from crud.pagination import apply_keyset, keyset_order, split_page
+from crud.students import prepare_bulk, bulk_values, insert_bulk
+from crud.students import (
+    claim_supervisor_statement, assign_supervisor_statement, claim_memory_master_statement,
+    release_memory_master_statement, assign_memory_master_statement, assignment_error,
+)
+from crud.bulk import BULK_BATCH_SIZE
+from crud.updates import changed_fields
+from models import Student, Supervisor, MemoryMaster
+from schemas import StudentLogin, StudentCreate, StudentPatch, BulkError, BulkResult, StudentFilters
+from crud.hashing import hash_password_async, verify_and_update_async, hash_many_async
+from crud.retry import retry_locked
+
+# Async CRUD operations for Student.
+# bcrypt is CPU bound, so hashing runs on the hashing pool instead of blocking the event loop.
+async def get_all(db: AsyncSession, skip: int = 0, limit: int = 10, options: list = (), filters: StudentFilters | None = None) -> list[Student]:
+    where, keys = students.list_criteria(filters)
+    result = await db.execute(select(Student).options(*options).where(*where).order_by(*keyset_order(keys)).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_page(db: AsyncSession, cursor: str = "", limit: int = 10, options: list = (), filters: StudentFilters | None = None) -> tuple[list[Student], str | None]:
+    where, keys = students.list_criteria(filters)
+    result = await db.execute(apply_keyset(select(Student).options(*options).where(*where), keys, cursor, limit))
+    return split_page(result.scalars().all(), keys, limit)
+
+async def get_all_rows(db: AsyncSession, skip: int = 0, limit: int = 10, filters: StudentFilters | None = None) -> list[dict]:
+    return await db.run_sync(students.get_all_rows, skip, limit, filters)
+
+async def get_page_rows(db: AsyncSession, cursor: str = "", limit: int = 10, filters: StudentFilters | None = None) -> tuple[list[dict], str | None]:
+    return await db.run_sync(students.get_page_rows, cursor, limit, filters)
+
+async def version(db: AsyncSession, student_id: int) -> dict | None:
+    return await db.run_sync(students.version, student_id)
+
+async def login(db: AsyncSession, student: StudentLogin) -> Student:
+    result = await db.execute(select(Student).filter(Student.email == student.email))
+    db_student = result.scalars().first()
+    if not db_student :
+        raise HTTPException(status_code=400, detail="Email is not registered")
+    is_valid, new_hash = await verify_and_update_async(student.password, db_student.hashed_password)
+    if not is_valid:
+        raise HTTPException(status_code=401, detail="Password is incorrect")
+    return await activate(db, db_student, new_hash)
+
+# The write of a login, retried alone so a locked database does not run bcrypt again
+@retry_locked
+async def activate(db: AsyncSession, db_student: Student, new_hash: str | None) -> Student:
+    if new_hash:
+        db_student.hashed_password = new_hash  # Rehash with the current bcrypt cost
+    db_student.is_active = True  # Set the student as active upon login
+    await db.commit()
+    forget_user(db_student.id)
+    await db.refresh(db_student)
+    return db_student
+
+async def create(db: AsyncSession, student: StudentCreate) -> Student:
+    return await insert_student(db, student, await hash_password_async(student.password))
+
+# Hashed by the caller: only the insert is retried on a locked database
+@retry_locked
+async def insert_student(db: AsyncSession, student: StudentCreate, hashed_password: str) -> Student:
+    db_student = Student(
+        full_name=student.full_name,
+        email=student.email,
+        hashed_password=hashed_password,
+        is_active=student.is_active,
+        is_admin=student.is_admin,
+        supervisor_id=student.supervisor_id,
+        memory_master_id=student.memory_master_id
+    )
+    db.add(db_student)
+    await db.execute(stats.increment(db, stats.student_deltas(1, 1, student.supervisor_id is None, student.memory_master_id is None)))
+    await db.commit()
+    await db.refresh(db_student)
+    return db_student
+
+# Passwords are hashed on the pool, the inserts reuse the sync implementation through run_sync
+async def bulk_create(db: AsyncSession, rows: list[dict], batch_size: int = BULK_BATCH_SIZE) -> BulkResult:
+    errors: list[BulkError] = []
+    valid = prepare_bulk(rows, errors)
+    hashed_passwords = await hash_many_async([student.password for _, student in valid])
+    return await db.run_sync(insert_bulk, bulk_values(valid, hashed_passwords), errors, batch_size)
+
+async def get(db: AsyncSession, student_id: int, options: list = ()) -> Student:
+    return await db.get(Student, student_id, options=options)
+
+async def update(db: AsyncSession, student_id: int, student_update: StudentPatch) -> Student:
+    changes = changed_fields(student_update)
+    password = changes.pop("password", None)
+    if password is not None:
+        changes["hashed_password"] = await hash_password_async(password)
+    return await db.run_sync(students.apply_update, student_id, changes)
+
+@retry_locked
+async def delete(db: AsyncSession, student_id: int) -> Student:
+    db_student = await db.get(Student, student_id)
+    if not db_student:
+        return None
+    await db.delete(db_student)
+    await db.execute(stats.increment(db, stats.student_deltas(-1, 1, db_student.supervisor_id is None, db_student.memory_master_id is None)))
+    await db.commit()
+    forget_user(student_id)
+    return db_student
+
+# Atomic conditional UPDATEs shared with the sync implementation (see crud/students.py)
+@retry_locked
+async def choose_supervisor(db: AsyncSession, student_id: int, supervisor_id: int) -> Student:
+    claimed = (await db.execute(claim_supervisor_statement(supervisor_id))).rowcount
+    if claimed:
+        await db.execute(stats.increment(db, stats.assignment_source(Supervisor, student_id, supervisor_id)))
+    db_student = claimed and (await db.execute(assign_supervisor_statement(student_id, supervisor_id))).first()
+    if not db_student:
+        await db.rollback()
+        await db.run_sync(assignment_error, student_id, Student.supervisor_id, Supervisor, supervisor_id, "Supervisor")
+    await db.commit()
+    catalog_cache.invalidate(supervisors.CACHE_NAMESPACE)
+    return db_student
+
+@retry_locked
+async def choose_memory_master(db: AsyncSession, student_id: int, memory_master_id: int) -> Student:
+    claimed = (await db.execute(claim_memory_master_statement(memory_master_id))).rowcount
+    if claimed:
+        await db.execute(stats.increment(db, stats.assignment_source(MemoryMaster, student_id, memory_master_id)))
+    db_student = claimed and (await db.execute(assign_memory_master_statement(student_id, memory_master_id))).first()
+    if not db_student:
+        await db.rollback()
+        await db.run_sync(assignment_error, student_id, Student.memory_master_id, MemoryMaster, memory_master_id, "Memory Master")
+    await db.commit()
+    catalog_cache.invalidate(memory_masters.CACHE_NAMESPACE)
+    return db_student
+
+@retry_locked
+async def change_memory_master(db: AsyncSession, student_id: int, memory_master_id: int) -> Student:
+    claimed = (await db.execute(claim_memory_master_statement(memory_master_id))).rowcount
+    if claimed:
+        await db.execute(stats.increment(db, stats.assignment_source(MemoryMaster, student_id, memory_master_id, release=True)))
+        # Reset the previous Memory Master's availability
+        await db.execute(release_memory_master_statement(student_id, memory_master_id))
+    db_student = claimed and (await db.execute(assign_memory_master_statement(student_id, memory_master_id))).first()
+    if not db_student:
+        await db.rollback()
+        await db.run_sync(assignment_error, student_id, Student.memory_master_id, MemoryMaster, memory_master_id, "Memory Master")
+    await db.commit()
+    catalog_cache.invalidate(memory_masters.CACHE_NAMESPACE)
+    return db_student
@@ -0,0 +1,75 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import catalog_cache
+from crud.pagination import apply_keyset, keyset_order, split_page
+from crud.filtering import filters_key
+from crud.conditional import list_version, row_version
+from crud import supervisors, stats
+from crud.supervisors import CACHE_NAMESPACE
+from crud.bulk import BULK_BATCH_SIZE
+from crud.retry import retry_locked
+from models import Supervisor
+from schemas import SupervisorBase, SupervisorCreate, SupervisorUpdate, SupervisorPatch, BulkResult, CatalogFilters
+
+# Async CRUD operations for Supervisor
+async def get_all(db: AsyncSession, skip: int = 0, limit: int = 10, options: list = (), filters: CatalogFilters | None = None) -> list[Supervisor]:
+    where, keys = supervisors.list_criteria(filters)
+    result = await db.execute(select(Supervisor).options(*options).where(*where).order_by(*keyset_order(keys)).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_page(db: AsyncSession, cursor: str = "", limit: int = 10, options: list = (), filters: CatalogFilters | None = None) -> tuple[list[Supervisor], str | None]:
+    where, keys = supervisors.list_criteria(filters)
+    result = await db.execute(apply_keyset(select(Supervisor).options(*options).where(*where), keys, cursor, limit))
+    return split_page(result.scalars().all(), keys, limit)
+
+# Cached reads, loaded with the sync row readers through run_sync
+async def get_all_cached(db: AsyncSession, skip: int = 0, limit: int = 10, filters: CatalogFilters | None = None) -> list[dict]:
+    key = f"all:{skip}:{limit}:{filters_key(filters)}"
+    return await catalog_cache.get_or_load_async(CACHE_NAMESPACE, key, lambda: db.run_sync(supervisors.get_all_rows, skip, limit, filters))
+
+async def get_page_cached(db: AsyncSession, cursor: str = "", limit: int = 10, filters: CatalogFilters | None = None) -> tuple[list[dict], str | None]:
+    key = f"page:{cursor}:{limit}:{filters_key(filters)}"
+    return await catalog_cache.get_or_load_async(CACHE_NAMESPACE, key, lambda: db.run_sync(supervisors.get_page_rows, cursor, limit, filters))
+
+async def get_cached(db: AsyncSession, supervisor_id: int) -> dict | None:
+    return await catalog_cache.get_or_load_async(CACHE_NAMESPACE, f"get:{supervisor_id}", lambda: db.run_sync(supervisors.get_row, supervisor_id))
+
+async def list_version_cached(db: AsyncSession) -> dict:
+    return await catalog_cache.get_or_load_async(CACHE_NAMESPACE, "version:list", lambda: db.run_sync(list_version, Supervisor))
+
+async def version_cached(db: AsyncSession, supervisor_id: int) -> dict | None:
+    return await catalog_cache.get_or_load_async(CACHE_NAMESPACE, f"version:{supervisor_id}", lambda: db.run_sync(row_version, Supervisor, supervisor_id))
+
+@retry_locked
+async def create(db: AsyncSession, supervisor: SupervisorCreate) -> Supervisor:
+    db_supervisor = Supervisor(
+        full_name=supervisor.full_name,
+        speciality=supervisor.speciality,
+    )
+    db.add(db_supervisor)
+    await db.flush()
+    await db.execute(stats.increment(db, stats.catalog_source(Supervisor, db_supervisor.id, 1)))
+    await db.commit()
+    catalog_cache.invalidate(CACHE_NAMESPACE)
+    await db.refresh(db_supervisor)
+    return db_supervisor
+
+async def bulk_create(db: AsyncSession, rows: list[dict], batch_size: int = BULK_BATCH_SIZE) -> BulkResult:
+    return await db.run_sync(supervisors.bulk_create, rows, batch_size)
+
+async def get(db: AsyncSession, supervisor_id: int, options: list = ()) -> Supervisor:
+    return await db.get(Supervisor, supervisor_id, options=options)
+
+async def update(db: AsyncSession, supervisor_id: int, supervisor_update: SupervisorPatch) -> Supervisor:
+    return await db.run_sync(supervisors.update, supervisor_id, supervisor_update)
+
+@retry_locked
+async def delete(db: AsyncSession, supervisor_id: int) -> Supervisor:
+    db_supervisor = await db.get(Supervisor, supervisor_id)
+    if not db_supervisor:
+        return None
+    await db.execute(stats.increment(db, stats.deletion_source(Supervisor, supervisor_id)))
+    await db.delete(db_supervisor)
+    await db.commit()
+    catalog_cache.invalidate(CACHE_NAMESPACE)
+    return db_supervisor
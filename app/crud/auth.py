@@ -1,19 +1,46 @@
 import time
-from typing import Dict
+from typing import Dict, NamedTuple
+import hashlib
 import os
-from dotenv import load_dotenv
 
 import jwt
 
-from schemas import Student, StudentLogin, StudentCreate
+from schemas import Student, StudentLogin, StudentCreate, StudentPatch
 from fastapi import Request, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-
-load_dotenv()
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from cache import LRUCache
+from database import WEB_CONCURRENCY, env_flag, get_db, get_async_db
+from models import Student as StudentModel
+import ratelimit
 
 JWT_SECRET = os.getenv("SECRET")
 JWT_ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_SECONDS = 600
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+# Embed is_admin/is_active in issued tokens: role checks then need no query. Off by default: a
+# role change or deletion reaches existing tokens only in the worker that made it (see
+# forget_user), the others trust the claims until the token expires (ACCESS_TOKEN_EXPIRE_SECONDS)
+JWT_ROLE_CLAIMS = env_flag("JWT_ROLE_CLAIMS", "0")
+# forget_user only reaches its own worker: with several, other workers keep a stale role this long
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30" if WEB_CONCURRENCY <= 1 else "5"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+
+# Verified token claims keyed by token hash, each entry expiring with its token
+_verified_tokens = LRUCache(maxsize=JWT_CACHE_SIZE)
+
+# Roles of recently seen users, dropped by forget_user when a student is updated or deleted
+_users = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+# When forget_user last ran per user: role claims of tokens issued before are not trusted. Kept
+# as long as a token lives.
+_role_changes = LRUCache(maxsize=USER_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_SECONDS)
+
+class CurrentUser(NamedTuple):
+    id: int
+    is_admin: bool
+    is_active: bool
 
 def token_response(token: str) -> Dict[str, str]:
     return {
@@ -21,11 +48,14 @@ def token_response(token: str) -> Dict[str, str]:
         "token_type": "bearer"
     }
     
-def sign_jwt(user_id: str) -> Dict[str, str]:
+def sign_jwt(user_id: str, is_admin: bool | None = None, is_active: bool | None = None) -> Dict[str, str]:
     payload = {
         "user_id": user_id,
         "expires": time.time() + ACCESS_TOKEN_EXPIRE_SECONDS
     }
+    if JWT_ROLE_CLAIMS and is_admin is not None:
+        payload["is_admin"] = bool(is_admin)
+        payload["is_active"] = bool(is_active)
     token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
     return token_response(token)
@@ -37,6 +67,17 @@ def decode_jwt(token: str) -> dict:
         return decoded_token if decoded_token["expires"] >= time.time() else None
     except:
         return {}
+
+# Verify a token once, reusing the claims of tokens already verified by this process
+def verify_token(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _verified_tokens.get(key)
+    if payload is not None:
+        return payload
+    payload = decode_jwt(token)
+    if payload:
+        _verified_tokens.set(key, payload, expires_at=payload["expires"])
+    return payload
     
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
@@ -47,31 +88,103 @@ class JWTBearer(HTTPBearer):
         if credentials:
             if not credentials.scheme == "Bearer":
                 raise HTTPException(status_code=403, detail="Invalid authentication scheme.")
-            if not self.verify_jwt(credentials.credentials):
+            if not self.verify_jwt(credentials.credentials, request):
                 raise HTTPException(status_code=403, detail="Invalid token or expired token.")
+            ratelimit.limit_user(request, request.state.jwt_claims.get("user_id"))
             return credentials.credentials
         else:
             raise HTTPException(status_code=403, detail="Invalid authorization code.")
 
-    def verify_jwt(self, jwtoken: str) -> bool:
+    def verify_jwt(self, jwtoken: str, request: Request = None) -> bool:
         isTokenValid: bool = False
 
-        try:
-            payload = decode_jwt(jwtoken)
-        except:
-            payload = None
+        # Every JWTBearer of a request shares the claims verified by the first one
+        payload = getattr(request.state, "jwt_claims", None) if request else None
+        if payload is None:
+            try:
+                payload = verify_token(jwtoken)
+            except:
+                payload = None
+            if payload and request:
+                request.state.jwt_claims = payload
         if payload:
             isTokenValid = True
 
         return isTokenValid
 
-def get_current_user_id(token: str = Depends(JWTBearer())):
+# Claims of the request's token, verified once by JWTBearer
+def get_token_claims(request: Request, token: str = Depends(JWTBearer())) -> dict:
+    return request.state.jwt_claims
+
+def get_current_user_id(claims: dict = Depends(get_token_claims)):
+    user_id: int = claims.get("user_id")
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Identifiant non trouvé dans le token")
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Identifiant non trouvé dans le token")
         return int(user_id)
-    except jwt.PyJWTError:
+    except (TypeError, ValueError):
         raise HTTPException(status_code=403, detail="Token invalide")
-    
+
+def forget_user(user_id: int):
+    _users.delete(user_id)
+    _role_changes.set(user_id, time.time())
+
+# Role claims issued after the user's last role change, if any
+def trusted_claims(user_id: int, claims: dict) -> bool:
+    if "is_admin" not in claims:
+        return False
+    changed_at = _role_changes.get(user_id)
+    return changed_at is None or claims["expires"] - ACCESS_TOKEN_EXPIRE_SECONDS >= changed_at
+
+# The authenticated user, resolved once per request: from the token's role claims when present,
+# then from the per-process cache, and only then from the database
+def cached_user(request: Request, user_id: int, claims: dict) -> CurrentUser | None:
+    user = getattr(request.state, "current_user", None)
+    if user is None and trusted_claims(user_id, claims):
+        user = CurrentUser(user_id, claims["is_admin"], claims.get("is_active", True))
+    if user is None:
+        user = _users.get(user_id)
+    if user is not None:
+        request.state.current_user = user
+    return user
+
+def remember_user(request: Request, row) -> CurrentUser:
+    if row is None:
+        raise HTTPException(status_code=401, detail="Student not found")
+    user = CurrentUser(row.id, bool(row.is_admin), bool(row.is_active))
+    _users.set(user.id, user)
+    request.state.current_user = user
+    return user
+
+def user_query(user_id: int):
+    return select(StudentModel.id, StudentModel.is_admin, StudentModel.is_active).where(StudentModel.id == user_id)
+
+def current_user(request: Request, user_id: int = Depends(get_current_user_id), claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)) -> CurrentUser:
+    user = cached_user(request, user_id, claims)
+    if user is not None:
+        return user
+    return remember_user(request, db.execute(user_query(user_id)).first())
+
+async def current_user_async(request: Request, user_id: int = Depends(get_current_user_id), claims: dict = Depends(get_token_claims), db: AsyncSession = Depends(get_async_db)) -> CurrentUser:
+    user = cached_user(request, user_id, claims)
+    if user is not None:
+        return user
+    return remember_user(request, (await db.execute(user_query(user_id))).first())
+
+def require_admin(user: CurrentUser = Depends(current_user)) -> CurrentUser:
+    if not user.is_admin:
+        raise HTTPException(status_code=403, detail="Access forbidden: Only admins can access this resource")
+    return user
+
+async def require_admin_async(user: CurrentUser = Depends(current_user_async)) -> CurrentUser:
+    if not user.is_admin:
+        raise HTTPException(status_code=403, detail="Access forbidden: Only admins can access this resource")
+    return user
+
+# Students update their own account, admins any account; only admins change is_admin/is_active
+def authorize_student_update(user: CurrentUser, student_id: int, student_update: StudentPatch) -> StudentPatch:
+    if user.is_admin:
+        return student_update
+    if user.id != student_id:
+        raise HTTPException(status_code=403, detail="Access forbidden: Students can only update their own account")
+    return student_update.model_copy(update={"is_admin": None, "is_active": None})
@@ -0,0 +1,57 @@
+import csv
+import io
+import os
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from schemas import BulkError
+
+# Rows sent per executemany; the whole import still commits as one transaction
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+
+# Dependency reading a bulk import body: a JSON array, a text/csv body or a multipart "file" upload
+async def read_bulk_rows(request: Request) -> list[dict]:
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing CSV file upload")
+        return parse_csv(await upload.read())
+    if content_type.startswith("text/csv"):
+        return parse_csv(await request.body())
+    try:
+        rows = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or a CSV file")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or a CSV file")
+    return rows
+
+def parse_csv(data: bytes) -> list[dict]:
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV file must be UTF-8 encoded")
+    # Empty cells fall back to the schema defaults
+    return [
+        {key: value for key, value in row.items() if key is not None and value not in ("", None)}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+
+# Validate every row, collecting failures instead of rejecting the whole import
+def validate_rows(rows: list, schema: type[BaseModel], errors: list[BulkError]) -> list[tuple[int, BaseModel]]:
+    valid = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, schema.model_validate(row)))
+        except ValidationError as exc:
+            detail = "; ".join(f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}" for error in exc.errors())
+            errors.append(BulkError(row=index, detail=detail))
+    return valid
+
+# Multi-row INSERTs of batch_size rows, inside the caller's transaction
+def insert_batches(db: Session, model, rows: list[dict], batch_size: int = BULK_BATCH_SIZE):
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(model), rows[start:start + batch_size])
@@ -0,0 +1,53 @@
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+# HTTP conditional requests.
+# A version is {"etag", "last_modified"}, computed from updated_at without loading the body:
+# count + max(updated_at) for a table (any insert, update or delete changes one of them),
+# updated_at for a single row. A matching If-None-Match is answered with an empty 304.
+
+def make_version(*parts, last_modified=None) -> dict:
+    digest = hashlib.sha256(":".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return {
+        "etag": f'"{digest}"',
+        "last_modified": format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True) if last_modified else None,
+    }
+
+def list_version(db: Session, model) -> dict:
+    count, last_modified = db.execute(select(func.count(), func.max(model.updated_at)).select_from(model)).one()
+    return make_version(model.__tablename__, count, last_modified, last_modified=last_modified)
+
+# None when the row does not exist, so the route answers its usual 404
+def row_version(db: Session, model, row_id: int) -> dict | None:
+    updated_at = db.execute(select(model.updated_at).where(model.id == row_id)).scalar()
+    if updated_at is None:
+        return None
+    return make_version(model.__tablename__, row_id, updated_at, last_modified=updated_at)
+
+def version_headers(version: dict) -> dict:
+    headers = {"ETag": version["etag"]}
+    if version["last_modified"]:
+        headers["Last-Modified"] = version["last_modified"]
+    return headers
+
+def is_not_modified(request: Request, version: dict | None) -> bool:
+    if version is None:
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or version["etag"] in tags or f'W/{version["etag"]}' in tags
+
+# Answers 304 when the client's copy is current, otherwise sets the validators on the response
+def conditional_response(request: Request, response: Response, version: dict | None) -> Response | None:
+    if version is None:
+        return None
+    if is_not_modified(request, version):
+        return Response(status_code=304, headers=version_headers(version))
+    response.headers.update(version_headers(version))
+    return None
@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+import os
+from typing import Literal
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from database import SessionLocal, AsyncSessionLocal, get_engine, get_async_engine
+
+# Rows fetched and encoded per chunk; memory stays bounded by one batch whatever the table size
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def encode_header(names: list[str], format: ExportFormat) -> str:
+    if format == "csv":
+        return encode_batch(names, [names], format)
+    return ""
+
+# Encode plain column tuples, skipping ORM hydration and pydantic validation
+def encode_batch(names: list[str], rows, format: ExportFormat) -> str:
+    if format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+    return "".join(json.dumps(dict(zip(names, row))) + "\n" for row in rows)
+
+# The session is opened inside the generator: the request's get_db session is
+# already closed by the time the response body is streamed.
+def stream_rows(columns: list, format: ExportFormat):
+    names = [column.key for column in columns]
+    yield encode_header(names, format)
+    db = SessionLocal(bind=get_engine())
+    try:
+        result = db.execute(select(*columns).order_by(columns[0]).execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for batch in result.partitions():
+            yield encode_batch(names, batch, format)
+    finally:
+        db.close()
+
+async def stream_rows_async(columns: list, format: ExportFormat):
+    names = [column.key for column in columns]
+    yield encode_header(names, format)
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        result = await db.stream(select(*columns).order_by(columns[0]).execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.partitions():
+            yield encode_batch(names, batch, format)
+
+def export_response(rows, name: str, format: ExportFormat) -> StreamingResponse:
+    return StreamingResponse(
+        rows,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
@@ -0,0 +1,83 @@
+import sys
+from typing import Optional
+from fastapi import Query
+from schemas import CatalogFilters, CatalogSort, StudentFilters, StudentSort
+
+# Shared pieces of the filtered, sorted listings
+
+# Dependencies reading the filters of the list endpoints from the query string
+def catalog_filters(
+    speciality: list[str] = Query([]),
+    available: Optional[bool] = None,
+    search: Optional[str] = Query(None, min_length=1),
+    sort: CatalogSort = "id",
+) -> CatalogFilters:
+    return CatalogFilters(speciality=speciality, available=available, search=search, sort=sort)
+
+def student_filters(
+    supervisor_id: Optional[int] = None,
+    memory_master_id: Optional[int] = None,
+    has_supervisor: Optional[bool] = None,
+    has_memory_master: Optional[bool] = None,
+    search: Optional[str] = Query(None, min_length=1),
+    sort: StudentSort = "id",
+) -> StudentFilters:
+    return StudentFilters(
+        supervisor_id=supervisor_id,
+        memory_master_id=memory_master_id,
+        has_supervisor=has_supervisor,
+        has_memory_master=has_memory_master,
+        search=search,
+        sort=sort,
+    )
+
+# Prefix search as a range (col >= 'Mar' AND col < 'Mas') so the column's index is used,
+# which LIKE 'Mar%' does not guarantee across backends and collations. Trailing last code points
+# cannot be incremented and carry over to the previous character; a prefix made only of them has
+# no upper bound.
+def prefix_range(column, prefix: str) -> list:
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return [column >= prefix]
+    following = ord(stem[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000  # surrogates are not characters and can't be encoded
+    return [column >= prefix, column < stem[:-1] + chr(following)]
+
+# Keyset sort keys for a whitelisted "column" / "-column" sort, with id as tie-breaker
+def sort_keys(sort: str, columns: dict) -> list:
+    name = sort.lstrip("-")
+    keys = [(columns[name], sort.startswith("-"))]
+    if name != "id":
+        keys.append((columns["id"], False))
+    return keys
+
+# WHERE clauses and sort keys for supervisors and memory masters, which share their columns
+def catalog_criteria(model, filters: CatalogFilters, available_clause, unavailable_clause) -> tuple[list, list]:
+    where = []
+    if filters.speciality:
+        where.append(model.speciality == filters.speciality[0] if len(filters.speciality) == 1 else model.speciality.in_(filters.speciality))
+    if filters.available is not None:
+        where.append(available_clause if filters.available else unavailable_clause)
+    if filters.search:
+        where += prefix_range(model.full_name, filters.search)
+    columns = {"id": model.id, "full_name": model.full_name, "speciality": model.speciality, "availability": model.availability}
+    return where, sort_keys(filters.sort, columns)
+
+def student_criteria(model, filters: StudentFilters) -> tuple[list, list]:
+    where = []
+    if filters.supervisor_id is not None:
+        where.append(model.supervisor_id == filters.supervisor_id)
+    if filters.memory_master_id is not None:
+        where.append(model.memory_master_id == filters.memory_master_id)
+    if filters.has_supervisor is not None:
+        where.append(model.supervisor_id.is_not(None) if filters.has_supervisor else model.supervisor_id.is_(None))
+    if filters.has_memory_master is not None:
+        where.append(model.memory_master_id.is_not(None) if filters.has_memory_master else model.memory_master_id.is_(None))
+    if filters.search:
+        where += prefix_range(model.full_name, filters.search)
+    columns = {"id": model.id, "full_name": model.full_name, "email": model.email}
+    return where, sort_keys(filters.sort, columns)
+
+def filters_key(filters) -> str:
+    return filters.model_dump_json() if filters is not None else ""
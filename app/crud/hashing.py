@@ -0,0 +1,66 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from database import WEB_CONCURRENCY
+
+# bcrypt cost factor. Hashes below it are upgraded on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a thread pool spreads hashing over all cores, shared out between
+# the worker processes
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))))
+# Hashing jobs allowed to wait for a worker before new ones are rejected with a 503
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "32"))
+# Threads of the separate pool hashing bulk imports, so an import never queues ahead of logins
+BULK_HASH_WORKERS = int(os.getenv("BULK_HASH_WORKERS", str(max(1, HASH_WORKERS // 2))))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_SIZE)
+_bulk_executor = ThreadPoolExecutor(max_workers=BULK_HASH_WORKERS, thread_name_prefix="bcrypt-bulk")
+
+def _submit(fn, *args) -> Future:
+    # Fail fast instead of letting a login burst pile up behind the pool
+    if not _slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Server is busy, please retry", headers={"Retry-After": "1"})
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+# Hash a password
+def hash_password(password: str) -> str:
+    return _submit(pwd_context.hash, password).result()
+
+# Verify a password
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _submit(pwd_context.verify, plain_password, hashed_password).result()
+
+# Verify a password, returning a new hash when the stored one uses outdated settings
+def verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return _submit(pwd_context.verify_and_update, plain_password, hashed_password).result()
+
+# Hash many passwords in parallel on the bulk pool (admin imports, exempt from the queue limit)
+def hash_many(passwords: list[str]) -> list[str]:
+    return list(_bulk_executor.map(pwd_context.hash, passwords))
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit(pwd_context.hash, password))
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await asyncio.wrap_future(_submit(pwd_context.verify_and_update, plain_password, hashed_password))
+
+async def hash_many_async(passwords: list[str]) -> list[str]:
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(_bulk_executor, pwd_context.hash, password) for password in passwords))
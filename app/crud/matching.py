@@ -0,0 +1,163 @@
+from collections import Counter
+from fastapi import HTTPException
+from sqlalchemy import bindparam, select, update as sql_update
+from sqlalchemy.orm import Session
+from cache import catalog_cache
+from crud import supervisors, memory_masters, stats
+from crud.retry import retry_locked
+from models import Student, Supervisor, MemoryMaster
+from schemas import MatchingRequest, MatchingAssignment, MatchingResult
+
+# Batch assignment of students from ranked preferences.
+# Supervisors and memory masters have no preferences of their own: they all rank students in
+# request order. Under such a common priority, student-proposing deferred acceptance reduces to
+# serial dictatorship (each student in turn takes their best choice with capacity left), so the
+# matching is stable and student-optimal and is computed in a single pass over the preferences.
+
+# Ids per IN (...) lookup, well below the bound parameter limit of SQLite
+MATCHING_LOOKUP_BATCH = 500
+
+students_table = Student.__table__
+supervisors_table = Supervisor.__table__
+memory_masters_table = MemoryMaster.__table__
+
+# Executemany statements, each guarded like the single-student assignment
+claim_supervisors_statement = (
+    sql_update(supervisors_table)
+    .where(supervisors_table.c.id == bindparam("target_id"), supervisors_table.c.availability >= bindparam("claimed"))
+    .values(availability=supervisors_table.c.availability - bindparam("claimed"))
+)
+
+claim_memory_masters_statement = (
+    sql_update(memory_masters_table)
+    .where(memory_masters_table.c.id == bindparam("target_id"), memory_masters_table.c.availability.is_(True))
+    .values(availability=False)
+)
+
+assign_supervisors_statement = (
+    sql_update(students_table)
+    .where(students_table.c.id == bindparam("student_id"), students_table.c.supervisor_id.is_(None))
+    .values(supervisor_id=bindparam("target_id"))
+)
+
+assign_memory_masters_statement = (
+    sql_update(students_table)
+    .where(students_table.c.id == bindparam("student_id"), students_table.c.memory_master_id.is_(None))
+    .values(memory_master_id=bindparam("target_id"))
+)
+
+def match(preferences: list[tuple[int, list[int]]], capacity: dict[int, int]) -> dict[int, int]:
+    assigned = {}
+    for student_id, ranked in preferences:
+        for target_id in ranked:
+            if capacity.get(target_id, 0) > 0:
+                capacity[target_id] -= 1
+                assigned[student_id] = target_id
+                break
+    return assigned
+
+def chunks(ids: list[int]):
+    for start in range(0, len(ids), MATCHING_LOOKUP_BATCH):
+        yield ids[start:start + MATCHING_LOOKUP_BATCH]
+
+def load_students(db: Session, student_ids: list[int]) -> dict:
+    current = {}
+    for chunk in chunks(student_ids):
+        query = select(Student.id, Student.supervisor_id, Student.memory_master_id).where(Student.id.in_(chunk))
+        current.update((row.id, row) for row in db.execute(query))
+    return current
+
+def load_capacity(db: Session, target_ids: set[int], query, capacity) -> dict[int, int]:
+    loaded = {}
+    for chunk in chunks(sorted(target_ids)):
+        loaded.update((row[0], capacity(row)) for row in db.execute(query(chunk)))
+    return loaded
+
+# Rows matched by an executemany UPDATE, one statement per row where the driver cannot tell
+def execute_checked(db: Session, statement, rows: list[dict]) -> bool:
+    if not rows:
+        return True
+    if db.get_bind().dialect.supports_sane_multi_rowcount:
+        return db.execute(statement, rows).rowcount == len(rows)
+    return all(db.execute(statement, row).rowcount == 1 for row in rows)
+
+def run(db: Session, request: MatchingRequest) -> MatchingResult:
+    # A student listed twice keeps their first entry
+    ordered, seen = [], set()
+    for preference in request.preferences:
+        if preference.student_id not in seen:
+            seen.add(preference.student_id)
+            ordered.append(preference)
+
+    # Only students without a supervisor/memory master take part on that side
+    current = load_students(db, [preference.student_id for preference in ordered])
+    unknown = [preference.student_id for preference in ordered if preference.student_id not in current]
+    supervisor_wanted, memory_master_wanted = [], []
+    for preference in ordered:
+        student = current.get(preference.student_id)
+        if student is None:
+            continue
+        if preference.supervisors and student.supervisor_id is None:
+            supervisor_wanted.append((student.id, preference.supervisors))
+        if preference.memory_masters and student.memory_master_id is None:
+            memory_master_wanted.append((student.id, preference.memory_masters))
+
+    supervisor_capacity = load_capacity(
+        db, {target for _, ranked in supervisor_wanted for target in ranked},
+        lambda ids: select(Supervisor.id, Supervisor.availability).where(Supervisor.id.in_(ids), Supervisor.availability > 0),
+        lambda row: row.availability,
+    )
+    memory_master_capacity = load_capacity(
+        db, {target for _, ranked in memory_master_wanted for target in ranked},
+        lambda ids: select(MemoryMaster.id).where(MemoryMaster.id.in_(ids), MemoryMaster.availability.is_(True)),
+        lambda row: 1,
+    )
+    supervisor_assigned = match(supervisor_wanted, supervisor_capacity)
+    memory_master_assigned = match(memory_master_wanted, memory_master_capacity)
+
+    if not request.dry_run and (supervisor_assigned or memory_master_assigned):
+        apply(db, supervisor_assigned, memory_master_assigned)
+
+    unmatched = {student_id for student_id, _ in supervisor_wanted if student_id not in supervisor_assigned}
+    unmatched |= {student_id for student_id, _ in memory_master_wanted if student_id not in memory_master_assigned}
+    return MatchingResult(
+        supervisors_assigned=len(supervisor_assigned),
+        memory_masters_assigned=len(memory_master_assigned),
+        unmatched=[preference.student_id for preference in ordered if preference.student_id in unmatched],
+        unknown_students=unknown,
+        assignments=[
+            MatchingAssignment(
+                student_id=preference.student_id,
+                supervisor_id=supervisor_assigned.get(preference.student_id),
+                memory_master_id=memory_master_assigned.get(preference.student_id),
+            )
+            for preference in ordered
+            if preference.student_id in supervisor_assigned or preference.student_id in memory_master_assigned
+        ],
+    )
+
+# One transaction: places are claimed and students assigned under the same guards as
+# choose_supervisor/choose_memory_master, so a concurrent change aborts the whole matching.
+# The /stats counters are then moved from the assigned students, in batches of ids.
+@retry_locked
+def apply(db: Session, supervisor_assigned: dict[int, int], memory_master_assigned: dict[int, int]):
+    applied = (
+        execute_checked(db, claim_supervisors_statement, [
+            {"target_id": target_id, "claimed": claimed} for target_id, claimed in Counter(supervisor_assigned.values()).items()
+        ])
+        and execute_checked(db, claim_memory_masters_statement, [{"target_id": target_id} for target_id in memory_master_assigned.values()])
+        and execute_checked(db, assign_supervisors_statement, [
+            {"student_id": student_id, "target_id": target_id} for student_id, target_id in supervisor_assigned.items()
+        ])
+        and execute_checked(db, assign_memory_masters_statement, [
+            {"student_id": student_id, "target_id": target_id} for student_id, target_id in memory_master_assigned.items()
+        ])
+    )
+    if not applied:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Assignments changed during matching, please retry")
+    for model, assigned in ((Supervisor, list(supervisor_assigned)), (MemoryMaster, list(memory_master_assigned))):
+        for start in range(0, len(assigned), MATCHING_LOOKUP_BATCH):
+            db.execute(stats.increment(db, stats.assigned_source(model, assigned[start:start + MATCHING_LOOKUP_BATCH])))
+    db.commit()
+    catalog_cache.invalidate(supervisors.CACHE_NAMESPACE, memory_masters.CACHE_NAMESPACE)
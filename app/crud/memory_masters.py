@@ -1,30 +1,121 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from cache import catalog_cache
+from crud.pagination import apply_keyset, keyset_order, split_page
+from crud.filtering import catalog_criteria, filters_key
+from crud.conditional import list_version, row_version
+from crud.bulk import BULK_BATCH_SIZE, validate_rows, insert_batches
+from crud.updates import changed_fields, update_returning
+from crud import stats
+from crud.retry import retry_locked
 from models import MemoryMaster
-from schemas import MemoryMasterBase, MemoryMasterCreate, MemoryMasterUpdate
+from schemas import MemoryMasterBase, MemoryMasterCreate, MemoryMasterUpdate, MemoryMasterPatch, BulkError, BulkResult, CatalogFilters
 
-def get_all(db: Session, skip: int = 0, limit: int = 10) -> list[MemoryMaster]:
-    return db.query(MemoryMaster).offset(skip).limit(limit).all()
+# Cache namespace of memory_masters reads, invalidated by every write touching a memory_master
+CACHE_NAMESPACE = "memory_masters"
 
+# Columns exposed by the API
+PUBLIC_COLUMNS = [MemoryMaster.id, MemoryMaster.full_name, MemoryMaster.speciality, MemoryMaster.availability]
+
+def get_all(db: Session, skip: int = 0, limit: int = 10, options: list = (), filters: CatalogFilters | None = None) -> list[MemoryMaster]:
+    where, keys = list_criteria(filters)
+    return db.query(MemoryMaster).options(*options).filter(*where).order_by(*keyset_order(keys)).offset(skip).limit(limit).all()
+
+# Keyset pagination on the sort key and id: constant cost per page, stable under concurrent inserts
+def get_page(db: Session, cursor: str = "", limit: int = 10, options: list = (), filters: CatalogFilters | None = None) -> tuple[list[MemoryMaster], str | None]:
+    where, keys = list_criteria(filters)
+    rows = apply_keyset(db.query(MemoryMaster).options(*options).filter(*where), keys, cursor, limit).all()
+    return split_page(rows, keys, limit)
+
+# WHERE clauses and sort keys of a listing, served by ix_memory_masters_speciality_availability and the full_name index
+def list_criteria(filters: CatalogFilters | None) -> tuple[list, list]:
+    return catalog_criteria(MemoryMaster, filters or CatalogFilters(), MemoryMaster.availability.is_(True), MemoryMaster.availability.is_(False))
+
+# Plain-row readers backing the cache: column tuples, no ORM objects
+def get_all_rows(db: Session, skip: int = 0, limit: int = 10, filters: CatalogFilters | None = None) -> list[dict]:
+    where, keys = list_criteria(filters)
+    query = select(*PUBLIC_COLUMNS).where(*where).order_by(*keyset_order(keys)).offset(skip).limit(limit)
+    return [row._asdict() for row in db.execute(query)]
+
+def get_page_rows(db: Session, cursor: str = "", limit: int = 10, filters: CatalogFilters | None = None) -> tuple[list[dict], str | None]:
+    where, keys = list_criteria(filters)
+    rows, next_cursor = split_page(db.execute(apply_keyset(select(*PUBLIC_COLUMNS).where(*where), keys, cursor, limit)).all(), keys, limit)
+    return [row._asdict() for row in rows], next_cursor
+
+def get_row(db: Session, memory_master_id: int) -> dict | None:
+    row = db.execute(select(*PUBLIC_COLUMNS).where(MemoryMaster.id == memory_master_id)).first()
+    return row._asdict() if row else None
+
+# Cached reads, keyed by the filters as well
+def get_all_cached(db: Session, skip: int = 0, limit: int = 10, filters: CatalogFilters | None = None) -> list[dict]:
+    return catalog_cache.get_or_load(CACHE_NAMESPACE, f"all:{skip}:{limit}:{filters_key(filters)}", lambda: get_all_rows(db, skip, limit, filters))
+
+def get_page_cached(db: Session, cursor: str = "", limit: int = 10, filters: CatalogFilters | None = None) -> tuple[list[dict], str | None]:
+    return catalog_cache.get_or_load(CACHE_NAMESPACE, f"page:{cursor}:{limit}:{filters_key(filters)}", lambda: get_page_rows(db, cursor, limit, filters))
+
+def get_cached(db: Session, memory_master_id: int) -> dict | None:
+    return catalog_cache.get_or_load(CACHE_NAMESPACE, f"get:{memory_master_id}", lambda: get_row(db, memory_master_id))
+
+# Validators of the list and single reads, cached with them and invalidated by the same writes
+def list_version_cached(db: Session) -> dict:
+    return catalog_cache.get_or_load(CACHE_NAMESPACE, "version:list", lambda: list_version(db, MemoryMaster))
+
+def version_cached(db: Session, memory_master_id: int) -> dict | None:
+    return catalog_cache.get_or_load(CACHE_NAMESPACE, f"version:{memory_master_id}", lambda: row_version(db, MemoryMaster, memory_master_id))
+
+@retry_locked
 def create(db: Session, memory_master: MemoryMasterCreate) -> MemoryMaster:
     db_memory_master = MemoryMaster(
         full_name=memory_master.full_name,
         speciality=memory_master.speciality,
     )
     db.add(db_memory_master)
+    db.flush()
+    db.execute(stats.increment(db, stats.catalog_source(MemoryMaster, db_memory_master.id, 1)))
     db.commit()
+    catalog_cache.invalidate(CACHE_NAMESPACE)
     db.refresh(db_memory_master)
     return db_memory_master
 
-def get(db: Session, memory_master_id: int) -> MemoryMaster:
-    return db.query(MemoryMaster).filter(MemoryMaster.id == memory_master_id).first()
+# Bulk import in batched multi-row INSERTs, invalid rows are reported and skipped
+@retry_locked
+def bulk_create(db: Session, rows: list[dict], batch_size: int = BULK_BATCH_SIZE) -> BulkResult:
+    errors: list[BulkError] = []
+    valid = validate_rows(rows, MemoryMasterCreate, errors)
+    values = [{"full_name": memory_master.full_name, "speciality": memory_master.speciality} for _, memory_master in valid]
+    insert_batches(db, MemoryMaster, values, batch_size)
+    if values:
+        db.execute(stats.increment(db, stats.catalog_deltas(MemoryMaster, 1, [row["speciality"] for row in values])))
+    db.commit()
+    catalog_cache.invalidate(CACHE_NAMESPACE)
+    return BulkResult(created=len(values), errors=errors)
+
+def get(db: Session, memory_master_id: int, options: list = ()) -> MemoryMaster:
+    return db.query(MemoryMaster).options(*options).filter(MemoryMaster.id == memory_master_id).first()
 
-def update(db: Session, memory_master_id: int, memory_master_update: MemoryMasterUpdate) -> MemoryMaster:
-    pass
+# PUT and PATCH: one UPDATE ... RETURNING of the fields sent. A new speciality moves the row's
+# counters from the old speciality to the new one.
+@retry_locked
+def update(db: Session, memory_master_id: int, memory_master_update: MemoryMasterPatch) -> MemoryMaster:
+    changes = changed_fields(memory_master_update)
+    moved = "speciality" in changes
+    if moved:
+        db.execute(stats.increment(db, stats.catalog_source(MemoryMaster, memory_master_id, -1)))
+    db_memory_master = update_returning(db, MemoryMaster, memory_master_id, changes, PUBLIC_COLUMNS)
+    if moved:
+        db.execute(stats.increment(db, stats.catalog_source(MemoryMaster, memory_master_id, 1)))
+    db.commit()
+    if db_memory_master is not None:
+        catalog_cache.invalidate(CACHE_NAMESPACE)
+    return db_memory_master
 
+@retry_locked
 def delete(db: Session, memory_master_id: int) -> MemoryMaster:
     db_memory_master = db.query(MemoryMaster).filter(MemoryMaster.id == memory_master_id).first()
     if not db_memory_master:
         return None
+    db.execute(stats.increment(db, stats.deletion_source(MemoryMaster, memory_master_id)))
     db.delete(db_memory_master)
     db.commit()
-    return db_memory_master
\ No newline at end of file
+    catalog_cache.invalidate(CACHE_NAMESPACE)
+    return db_memory_master
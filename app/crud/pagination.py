@@ -0,0 +1,54 @@
+import base64
+import json
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, literal, or_
+
+# Keyset (cursor) pagination.
+# A page seeks past the sort key of the previous page's last row instead of using OFFSET,
+# so every page costs the same index range scan however deep it is.
+# keys is a list of (column, descending) pairs and must end with a unique column such as id.
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+# Only the scalars encode_cursor writes (bool being an int) are compared to the sort keys
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(value, (int, str)) for value in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+# ORDER BY clauses of keys, also used by the OFFSET listings so both page the same way
+def keyset_order(keys: list) -> list:
+    return [column.desc() if descending else column.asc() for column, descending in keys]
+
+# Restrict and order a Query/Select to the page following cursor ("" for the first page)
+def apply_keyset(query, keys: list, cursor: str, limit: int):
+    if cursor:
+        # Bound with the column type: SQLAlchemy refuses < and > against a bare True/False
+        values = [literal(value, column.type) for value, (column, _) in zip(decode_cursor(cursor, len(keys)), keys)]
+        clauses = []
+        for i, (column, descending) in enumerate(keys):
+            step = column < values[i] if descending else column > values[i]
+            clauses.append(and_(*[keys[j][0] == values[j] for j in range(i)], step))
+        query = query.filter(or_(*clauses))
+    # One extra row tells whether there is a next page
+    return query.order_by(*keyset_order(keys)).limit(limit + 1)
+
+# Split the rows of apply_keyset into the page and the cursor of the next one
+def split_page(rows: list, keys: list, limit: int) -> tuple[list, str | None]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column, _ in keys])
+
+# Return the rows of a page, exposing the next cursor in the X-Next-Cursor header
+def page_response(response: Response, page: tuple[list, str | None]) -> list:
+    rows, next_cursor = page
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
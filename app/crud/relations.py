@@ -0,0 +1,46 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import joinedload, load_only, noload, selectinload
+from crud import students, supervisors, memory_masters
+from models import Student, Supervisor, MemoryMaster
+
+# Related data embedded with ?expand=...
+# Relationships are loaded eagerly with a constant number of queries whatever the page size:
+# many-to-one through a LEFT JOIN in the main query, one-to-many with one extra SELECT ... IN.
+# Only PUBLIC_COLUMNS are loaded (never hashed_password), relationships not asked for are not loaded.
+STUDENT_EXPANSIONS = ("supervisor", "memory_master")
+SUPERVISOR_EXPANSIONS = ("students",)
+MEMORY_MASTER_EXPANSIONS = ("students",)
+
+def parse_expand(expand: str | None, allowed: tuple) -> set[str]:
+    expanded = {name.strip() for name in (expand or "").split(",") if name.strip()}
+    unknown = expanded - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot expand {', '.join(sorted(unknown))}; expected one of {', '.join(allowed)}")
+    return expanded
+
+def student_options(expanded: set[str]) -> list:
+    return [
+        load_only(*students.PUBLIC_COLUMNS),
+        joinedload(Student.supervisor).load_only(*supervisors.PUBLIC_COLUMNS) if "supervisor" in expanded else noload(Student.supervisor),
+        joinedload(Student.memory_master).load_only(*memory_masters.PUBLIC_COLUMNS) if "memory_master" in expanded else noload(Student.memory_master),
+    ]
+
+def supervisor_options(expanded: set[str]) -> list:
+    if "students" in expanded:
+        return [selectinload(Supervisor.students).load_only(*students.PUBLIC_COLUMNS)]
+    return [noload(Supervisor.students)]
+
+def memory_master_options(expanded: set[str]) -> list:
+    if "students" in expanded:
+        return [selectinload(MemoryMaster.students).load_only(*students.PUBLIC_COLUMNS)]
+    return [noload(MemoryMaster.students)]
+
+# Serialize rows with their embedded relationships; fields that were not expanded are left out
+def expanded_response(content, schema, expanded: set[str], allowed: tuple, headers=None) -> JSONResponse:
+    exclude = set(allowed) - expanded
+    if isinstance(content, list):
+        body = [schema.model_validate(row).model_dump(mode="json", exclude=exclude) for row in content]
+    else:
+        body = schema.model_validate(content).model_dump(mode="json", exclude=exclude)
+    return JSONResponse(body, headers=dict(headers or {}))
@@ -0,0 +1,16 @@
+import importlib.util
+from fastapi.responses import ORJSONResponse
+from database import env_flag
+
+# Opt-in fast path of the list endpoints: rows are read as column tuples and encoded with orjson,
+# skipping ORM objects, response_model validation and the stdlib encoder.
+# The OpenAPI schemas still come from each route's response_model.
+FAST_JSON = env_flag("FAST_JSON")
+
+# orjson is an optional dependency, only needed for the fast path: fail at startup rather than
+# on the first list request
+if FAST_JSON and importlib.util.find_spec("orjson") is None:
+    raise RuntimeError("FAST_JSON=1 requires orjson (pip install orjson)")
+
+def fast_json_response(rows: list[dict], headers=None) -> ORJSONResponse:
+    return ORJSONResponse(rows, headers=dict(headers or {}))
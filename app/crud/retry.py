@@ -0,0 +1,60 @@
+import asyncio
+import functools
+import inspect
+import os
+import random
+import time
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+# Writes racing for the SQLite database lock.
+# SQLite has a single writer: a write waits up to SQLITE_BUSY_TIMEOUT_MS for the lock held by
+# another connection or worker process, then fails with "database is locked". Write operations
+# wrapped in retry_locked are rolled back and run again after a jittered exponential backoff, and
+# answered with a 503 once the attempts are exhausted. Other backends never raise it.
+DB_LOCKED_ATTEMPTS = int(os.getenv("DB_LOCKED_ATTEMPTS", "4"))
+DB_LOCKED_BACKOFF = float(os.getenv("DB_LOCKED_BACKOFF", "0.05"))  # seconds, doubled per attempt
+
+def is_locked(error: OperationalError) -> bool:
+    return "database is locked" in str(error.orig)
+
+def backoff(attempt: int) -> float:
+    return DB_LOCKED_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+
+def busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Database is busy, please retry", headers={"Retry-After": "1"})
+
+# The wrapped function takes the session first and runs its whole transaction, commit included
+def retry_locked(function):
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def retry_async(db, *args, **kwargs):
+            for attempt in range(DB_LOCKED_ATTEMPTS):
+                try:
+                    return await function(db, *args, **kwargs)
+                except OperationalError as error:
+                    if not is_locked(error):
+                        raise
+                    await db.rollback()
+                if attempt + 1 < DB_LOCKED_ATTEMPTS:
+                    await asyncio.sleep(backoff(attempt))
+            raise busy()
+        return retry_async
+
+    @functools.wraps(function)
+    def retry(db, *args, **kwargs):
+        for attempt in range(DB_LOCKED_ATTEMPTS):
+            try:
+                return function(db, *args, **kwargs)
+            except OperationalError as error:
+                if not is_locked(error):
+                    raise
+                db.rollback()
+            if attempt + 1 < DB_LOCKED_ATTEMPTS:
+                if in_greenlet():
+                    await_only(asyncio.sleep(backoff(attempt)))  # under AsyncSession.run_sync: don't block the event loop
+                else:
+                    time.sleep(backoff(attempt))
+        raise busy()
+    return retry
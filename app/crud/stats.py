@@ -0,0 +1,160 @@
+from sqlalchemy import Integer, cast, delete, func, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import Student, Supervisor, MemoryMaster, StatCounter
+from crud.retry import retry_locked
+from schemas import SpecialityStats, Stats
+
+# Aggregates of /stats.
+# The GROUP BY queries of compute() are the reference, and cost a scan of every table. The
+# stats_counters rows hold the same numbers and are moved by deltas in the transaction of each
+# write (create, delete, assignment, speciality change), so read() costs one small query whatever
+# the number of students. rebuild() recomputes them from the GROUP BY queries.
+
+STUDENTS = "students"
+STUDENTS_WITHOUT_SUPERVISOR = "students_without_supervisor"
+STUDENTS_WITHOUT_MEMORY_MASTER = "students_without_memory_master"
+
+# Per speciality: (count counter, capacity counter, capacity of a row, student column, global counter)
+CATALOG_COUNTERS = {
+    Supervisor: ("supervisors", "supervisor_capacity", Supervisor.availability, Student.supervisor_id, STUDENTS_WITHOUT_SUPERVISOR),
+    MemoryMaster: ("memory_masters", "memory_masters_available", cast(MemoryMaster.availability, Integer), Student.memory_master_id, STUDENTS_WITHOUT_MEMORY_MASTER),
+}
+
+# ON CONFLICT upserts exist on both backends but are built by their dialect modules
+INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+def speciality(model):
+    return func.coalesce(model.speciality, "")
+
+# Adds deltas to the counters, creating missing rows. The deltas are either a dict
+# {(name, speciality): delta} or a list of selects of (name, speciality, delta) rows read in the
+# statement itself, summed per counter so a row is only touched once.
+def increment(db, deltas):
+    insert = INSERTS[db.get_bind().dialect.name]
+    if isinstance(deltas, dict):
+        statement = insert(StatCounter).values([
+            {"name": name, "speciality": speciality, "value": value} for (name, speciality), value in deltas.items()
+        ])
+    else:
+        rows = union_all(*deltas).subquery()
+        name, speciality, value = rows.c
+        summed = select(name, speciality, func.sum(value)).group_by(name, speciality)
+        statement = insert(StatCounter).from_select(["name", "speciality", "value"], summed)
+    return statement.on_conflict_do_update(
+        index_elements=[StatCounter.name, StatCounter.speciality],
+        set_={"value": StatCounter.value + statement.excluded.value},
+    )
+
+def student_deltas(sign: int, count: int, without_supervisor: int, without_memory_master: int) -> dict:
+    return {
+        (STUDENTS, ""): sign * count,
+        (STUDENTS_WITHOUT_SUPERVISOR, ""): sign * without_supervisor,
+        (STUDENTS_WITHOUT_MEMORY_MASTER, ""): sign * without_memory_master,
+    }
+
+def students_deltas(sign: int, rows: list[dict]) -> dict:
+    return student_deltas(
+        sign, len(rows),
+        sum(row["supervisor_id"] is None for row in rows),
+        sum(row["memory_master_id"] is None for row in rows),
+    )
+
+# Rows inserted with the column default availability, by bulk imports
+def catalog_deltas(model, sign: int, specialities: list[str]) -> dict:
+    count_name, capacity_name, *_ = CATALOG_COUNTERS[model]
+    capacity = int(model.__table__.c.availability.default.arg)
+    deltas = {}
+    for value in specialities:
+        deltas[(count_name, value)] = deltas.get((count_name, value), 0) + sign
+        deltas[(capacity_name, value)] = deltas.get((capacity_name, value), 0) + sign * capacity
+    return deltas
+
+# A supervisor/memory master row as it is in the database: added after its insert, and removed
+# and added back around an update of its speciality
+def catalog_source(model, row_id: int, sign: int):
+    count_name, capacity_name, capacity, *_ = CATALOG_COUNTERS[model]
+    return [
+        select(literal(count_name), speciality(model), literal(sign)).where(model.id == row_id),
+        select(literal(capacity_name), speciality(model), literal(sign) * capacity).where(model.id == row_id),
+    ]
+
+# A deleted row, whose students the ORM unassigns with it
+def deletion_source(model, row_id: int):
+    _, _, _, student_column, unassigned_name = CATALOG_COUNTERS[model]
+    return catalog_source(model, row_id, -1) + [
+        select(literal(unassigned_name), literal(""), func.count()).where(student_column == row_id),
+    ]
+
+# A place claimed on target_id by a student, read before the student row is updated: the
+# student stops counting as unassigned if they were. With release, the student's previous
+# memory master, claimed until now, gets its place back.
+def assignment_source(model, student_id: int, target_id: int, release: bool = False):
+    _, capacity_name, _, student_column, unassigned_name = CATALOG_COUNTERS[model]
+    parts = [
+        select(literal(capacity_name), speciality(model), literal(-1)).where(model.id == target_id),
+        select(literal(unassigned_name), literal(""), literal(-1)).where(Student.id == student_id, student_column.is_(None)),
+    ]
+    if release:
+        previous_id = select(student_column).where(Student.id == student_id).scalar_subquery()
+        parts.append(
+            select(literal(capacity_name), speciality(model), literal(1))
+            .where(model.id == previous_id, model.id != target_id, model.availability.is_(False))
+        )
+    return parts
+
+# Places taken by students assigned in a batch (matching), read after the student rows are updated
+def assigned_source(model, student_ids: list[int]):
+    _, capacity_name, _, student_column, unassigned_name = CATALOG_COUNTERS[model]
+    return [
+        select(literal(capacity_name), speciality(model), literal(-1)).join_from(Student, model, student_column == model.id).where(Student.id.in_(student_ids)),
+        select(literal(unassigned_name), literal(""), literal(-1)).where(Student.id.in_(student_ids)),
+    ]
+
+# exact: the GROUP BY queries instead of the counters
+def get(db: Session, exact: bool = False) -> Stats:
+    return compute(db) if exact else read(db)
+
+def read(db: Session) -> Stats:
+    rows = db.execute(select(StatCounter.name, StatCounter.speciality, StatCounter.value))
+    return to_stats({(name, speciality): value for name, speciality, value in rows})
+
+def compute(db: Session) -> Stats:
+    return to_stats(compute_counters(db))
+
+def compute_counters(db: Session) -> dict:
+    counters = {}
+    students = db.execute(select(
+        func.count(),
+        func.count().filter(Student.supervisor_id.is_(None)),
+        func.count().filter(Student.memory_master_id.is_(None)),
+    )).one()
+    counters.update(student_deltas(1, *students))
+    for model, (count_name, capacity_name, capacity, _, _) in CATALOG_COUNTERS.items():
+        rows = db.execute(select(speciality(model), func.count(), func.coalesce(func.sum(capacity), 0)).group_by(speciality(model)))
+        for value, count, total in rows:
+            counters[(count_name, value)] = count
+            counters[(capacity_name, value)] = total
+    return counters
+
+def to_stats(counters: dict) -> Stats:
+    names = {name for counters_of_model in CATALOG_COUNTERS.values() for name in counters_of_model[:2]}
+    specialities = {}
+    for (name, value), total in counters.items():
+        if name in names and total:
+            specialities.setdefault(value, {})[name] = total
+    return Stats(
+        students=counters.get((STUDENTS, ""), 0),
+        students_without_supervisor=counters.get((STUDENTS_WITHOUT_SUPERVISOR, ""), 0),
+        students_without_memory_master=counters.get((STUDENTS_WITHOUT_MEMORY_MASTER, ""), 0),
+        specialities=[SpecialityStats(speciality=value, **totals) for value, totals in sorted(specialities.items())],
+    )
+
+# Recomputes the counters from the GROUP BY queries
+@retry_locked
+def rebuild(db: Session) -> Stats:
+    counters = compute_counters(db)
+    db.execute(delete(StatCounter))
+    db.execute(increment(db, counters))
+    db.commit()
+    return to_stats(counters)
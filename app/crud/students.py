@@ -1,37 +1,83 @@
 from fastapi import HTTPException
+from sqlalchemy import select, update as sql_update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from cache import catalog_cache
+from crud.auth import forget_user
+from crud import supervisors, memory_masters, stats
+from crud.bulk import BULK_BATCH_SIZE, validate_rows, insert_batches
+from crud.pagination import apply_keyset, keyset_order, split_page
+from crud.filtering import student_criteria
+from crud.conditional import row_version
+from crud.updates import changed_fields, update_returning
 from models import Student, Supervisor, MemoryMaster
-from schemas import StudentLogin, StudentCreate, StudentUpdate
-from passlib.context import CryptContext
+from schemas import StudentLogin, StudentCreate, StudentPatch, BulkError, BulkResult, StudentFilters
+from crud.hashing import hash_password, verify_and_update, hash_many
+from crud.retry import retry_locked
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Attempts of a bulk import racing with concurrent registrations on the same email/full_name,
+# or deletions of the supervisors/memory masters it references
+BULK_MAX_ATTEMPTS = 3
 
-# Hash a password
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-# Verify a password
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# Columns exposed by the API (never hashed_password)
+PUBLIC_COLUMNS = [Student.id, Student.full_name, Student.email, Student.is_active, Student.is_admin, Student.supervisor_id, Student.memory_master_id]
 
 # CRUD operations for Student
-def get_all(db: Session, skip: int = 0, limit: int = 10) -> list[Student]:
-    return db.query(Student).offset(skip).limit(limit).all()
+def get_all(db: Session, skip: int = 0, limit: int = 10, options: list = (), filters: StudentFilters | None = None) -> list[Student]:
+    where, keys = list_criteria(filters)
+    return db.query(Student).options(*options).filter(*where).order_by(*keyset_order(keys)).offset(skip).limit(limit).all()
+
+# Keyset pagination on the sort key and id: constant cost per page, stable under concurrent inserts
+def get_page(db: Session, cursor: str = "", limit: int = 10, options: list = (), filters: StudentFilters | None = None) -> tuple[list[Student], str | None]:
+    where, keys = list_criteria(filters)
+    rows = apply_keyset(db.query(Student).options(*options).filter(*where), keys, cursor, limit).all()
+    return split_page(rows, keys, limit)
+
+# WHERE clauses and sort keys of a listing, served by the foreign key and full_name/email indexes
+def list_criteria(filters: StudentFilters | None) -> tuple[list, list]:
+    return student_criteria(Student, filters or StudentFilters())
+
+# Plain-row readers of the fast JSON path: column tuples, no ORM objects
+def get_all_rows(db: Session, skip: int = 0, limit: int = 10, filters: StudentFilters | None = None) -> list[dict]:
+    where, keys = list_criteria(filters)
+    query = select(*PUBLIC_COLUMNS).where(*where).order_by(*keyset_order(keys)).offset(skip).limit(limit)
+    return [row._asdict() for row in db.execute(query)]
+
+def get_page_rows(db: Session, cursor: str = "", limit: int = 10, filters: StudentFilters | None = None) -> tuple[list[dict], str | None]:
+    where, keys = list_criteria(filters)
+    rows, next_cursor = split_page(db.execute(apply_keyset(select(*PUBLIC_COLUMNS).where(*where), keys, cursor, limit)).all(), keys, limit)
+    return [row._asdict() for row in rows], next_cursor
+
+# Validator of a single read (the row's updated_at)
+def version(db: Session, student_id: int) -> dict | None:
+    return row_version(db, Student, student_id)
 
 def login(db: Session, student: StudentLogin) -> Student:
     db_student = db.query(Student).filter(Student.email == student.email).first()
     if not db_student :
         raise HTTPException(status_code=400, detail="Email is not registered")
-    if not verify_password(student.password, db_student.hashed_password):
+    is_valid, new_hash = verify_and_update(student.password, db_student.hashed_password)
+    if not is_valid:
         raise HTTPException(status_code=401, detail="Password is incorrect")
-    
+    return activate(db, db_student, new_hash)
+
+# The write of a login, retried alone so a locked database does not run bcrypt again
+@retry_locked
+def activate(db: Session, db_student: Student, new_hash: str | None) -> Student:
+    if new_hash:
+        db_student.hashed_password = new_hash  # Rehash with the current bcrypt cost
     db_student.is_active = True  # Set the student as active upon login
     db.commit()
+    forget_user(db_student.id)
     db.refresh(db_student)
     return db_student
 
 def create(db: Session, student: StudentCreate) -> Student:
-    hashed_password = hash_password(student.password)
+    return insert_student(db, student, hash_password(student.password))
+
+# Hashed by the caller: only the insert is retried on a locked database
+@retry_locked
+def insert_student(db: Session, student: StudentCreate, hashed_password: str) -> Student:
     db_student = Student(
         full_name=student.full_name,
         email=student.email,
@@ -42,81 +88,227 @@ def create(db: Session, student: StudentCreate) -> Student:
         memory_master_id=student.memory_master_id
     )
     db.add(db_student)
+    db.execute(stats.increment(db, stats.student_deltas(1, 1, student.supervisor_id is None, student.memory_master_id is None)))
     db.commit()
     db.refresh(db_student)
     return db_student
 
-def get(db: Session, student_id: int) -> Student:
-    return db.query(Student).filter(Student.id == student_id).first()
+# Bulk import: validation, in-import duplicates and existing rows are reported per row
+def bulk_create(db: Session, rows: list[dict], batch_size: int = BULK_BATCH_SIZE) -> BulkResult:
+    errors: list[BulkError] = []
+    valid = prepare_bulk(rows, errors)
+    hashed_passwords = hash_many([student.password for _, student in valid])
+    return insert_bulk(db, bulk_values(valid, hashed_passwords), errors, batch_size)
+
+def prepare_bulk(rows: list[dict], errors: list[BulkError]) -> list[tuple[int, StudentCreate]]:
+    valid = []
+    seen_emails, seen_names = set(), set()
+    for index, student in validate_rows(rows, StudentCreate, errors):
+        if student.email in seen_emails:
+            errors.append(BulkError(row=index, detail="Duplicate email in import"))
+        elif student.full_name in seen_names:
+            errors.append(BulkError(row=index, detail="Duplicate full_name in import"))
+        else:
+            seen_emails.add(student.email)
+            seen_names.add(student.full_name)
+            valid.append((index, student))
+    return valid
+
+def bulk_values(valid: list[tuple[int, StudentCreate]], hashed_passwords: list[str]) -> list[tuple[int, dict]]:
+    return [
+        (index, {
+            "full_name": student.full_name,
+            "email": student.email,
+            "hashed_password": hashed_password,
+            "is_active": student.is_active,
+            "is_admin": student.is_admin,
+            "supervisor_id": student.supervisor_id,
+            "memory_master_id": student.memory_master_id,
+        })
+        for (index, student), hashed_password in zip(valid, hashed_passwords)
+    ]
 
-def update(db: Session, student_id: int, student_update: StudentUpdate) -> Student:
-    pass
+@retry_locked
+def insert_bulk(db: Session, values: list[tuple[int, dict]], errors: list[BulkError], batch_size: int = BULK_BATCH_SIZE) -> BulkResult:
+    for _ in range(BULK_MAX_ATTEMPTS):
+        values = drop_registered(db, values, errors, batch_size)
+        try:
+            rows = [row for _, row in values]
+            insert_batches(db, Student, rows, batch_size)
+            if rows:
+                db.execute(stats.increment(db, stats.students_deltas(1, rows)))
+            db.commit()
+            return BulkResult(created=len(values), errors=sorted(errors, key=lambda error: error.row))
+        except IntegrityError:
+            # A concurrent registration took an email or name, or a referenced row was deleted:
+            # check again and retry
+            db.rollback()
+    raise HTTPException(status_code=409, detail="Import conflicted with concurrent registrations, please retry")
 
+# Drop rows whose email or full_name is already registered, or whose supervisor or memory
+# master does not exist (an FK violation on PostgreSQL, a dangling id on SQLite)
+def drop_registered(db: Session, values: list[tuple[int, dict]], errors: list[BulkError], batch_size: int) -> list[tuple[int, dict]]:
+    emails, names, supervisor_ids, memory_master_ids = set(), set(), set(), set()
+    for start in range(0, len(values), batch_size):
+        chunk = [row for _, row in values[start:start + batch_size]]
+        emails.update(db.scalars(select(Student.email).where(Student.email.in_([row["email"] for row in chunk]))))
+        names.update(db.scalars(select(Student.full_name).where(Student.full_name.in_([row["full_name"] for row in chunk]))))
+        supervisor_ids.update(referenced_ids(db, Supervisor, [row["supervisor_id"] for row in chunk]))
+        memory_master_ids.update(referenced_ids(db, MemoryMaster, [row["memory_master_id"] for row in chunk]))
+    remaining = []
+    for index, row in values:
+        if row["email"] in emails:
+            errors.append(BulkError(row=index, detail="Email is already registered"))
+        elif row["full_name"] in names:
+            errors.append(BulkError(row=index, detail="Full name is already registered"))
+        elif row["supervisor_id"] is not None and row["supervisor_id"] not in supervisor_ids:
+            errors.append(BulkError(row=index, detail="Supervisor not found"))
+        elif row["memory_master_id"] is not None and row["memory_master_id"] not in memory_master_ids:
+            errors.append(BulkError(row=index, detail="Memory Master not found"))
+        else:
+            remaining.append((index, row))
+    return remaining
+
+# The ids among ids that exist in model's table
+def referenced_ids(db: Session, model, ids: list) -> list[int]:
+    ids = {row_id for row_id in ids if row_id is not None}
+    if not ids:
+        return []
+    return db.scalars(select(model.id).where(model.id.in_(ids))).all()
+
+def get(db: Session, student_id: int, options: list = ()) -> Student:
+    return db.query(Student).options(*options).filter(Student.id == student_id).first()
+
+# PUT and PATCH: one UPDATE of the fields sent, bcrypt only when a new password is among them
+def update(db: Session, student_id: int, student_update: StudentPatch) -> Student:
+    changes = changed_fields(student_update)
+    password = changes.pop("password", None)
+    if password is not None:
+        changes["hashed_password"] = hash_password(password)
+    return apply_update(db, student_id, changes)
+
+@retry_locked
+def apply_update(db: Session, student_id: int, changes: dict) -> Student:
+    try:
+        db_student = update_returning(db, Student, student_id, changes, PUBLIC_COLUMNS)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Email or full name is already registered")
+    if db_student is not None:
+        forget_user(student_id)  # is_admin/is_active may have changed
+    return db_student
+
+@retry_locked
 def delete(db: Session, student_id: int) -> Student:
     db_student = db.query(Student).filter(Student.id == student_id).first()
     if not db_student:
         return None
     db.delete(db_student)
+    db.execute(stats.increment(db, stats.student_deltas(-1, 1, db_student.supervisor_id is None, db_student.memory_master_id is None)))
     db.commit()
+    forget_user(student_id)
     return db_student
 
+# Supervisor and memory master assignment.
+# A slot is claimed with a conditional UPDATE (availability > 0, or availability still true) and the
+# student row is updated in the same transaction, so checking and taking a slot is a single atomic
+# statement: concurrent requests can't over-allocate, and backends with row locks (PostgreSQL)
+# serialize them on the claimed row. The reason for a failure is only looked up on the error path.
+# The /stats counters are moved in the same transaction, from the rows as they are before the
+# student is assigned.
+@retry_locked
 def choose_supervisor(db: Session, student_id: int, supervisor_id: int) -> Student:
-    db_student = db.query(Student).filter(Student.id == student_id).first()
-    db_supervisor = db.query(Supervisor).filter(Supervisor.id == supervisor_id).first()
+    claimed = db.execute(claim_supervisor_statement(supervisor_id)).rowcount
+    if claimed:
+        db.execute(stats.increment(db, stats.assignment_source(Supervisor, student_id, supervisor_id)))
+    db_student = claimed and db.execute(assign_supervisor_statement(student_id, supervisor_id)).first()
     if not db_student:
-        raise HTTPException(status_code=404, detail="Student not found")
-    
-    if db_student.supervisor_id == supervisor_id:
-        raise HTTPException(status_code=400, detail="Supervisor already assigned to this student")
-    
-    if db_supervisor.availability <= 0:
-        raise HTTPException(status_code=400, detail="Supervisor is not available")
-    
-    db_supervisor.availability -= 1
-    db_student.supervisor_id = supervisor_id
+        db.rollback()
+        assignment_error(db, student_id, Student.supervisor_id, Supervisor, supervisor_id, "Supervisor")
     db.commit()
-    db.refresh(db_student)
-    db.refresh(db_supervisor)
+    catalog_cache.invalidate(supervisors.CACHE_NAMESPACE)
     return db_student
 
+@retry_locked
 def choose_memory_master(db: Session, student_id: int, memory_master_id: int) -> Student:
-    db_student = db.query(Student).filter(Student.id == student_id).first()
-    db_memory_master = db.query(MemoryMaster).filter(MemoryMaster.id == memory_master_id).first()
+    claimed = db.execute(claim_memory_master_statement(memory_master_id)).rowcount
+    if claimed:
+        db.execute(stats.increment(db, stats.assignment_source(MemoryMaster, student_id, memory_master_id)))
+    db_student = claimed and db.execute(assign_memory_master_statement(student_id, memory_master_id)).first()
     if not db_student:
-        raise HTTPException(status_code=404, detail="Student not found")
-    
-    if db_student.memory_master_id == memory_master_id:
-        raise HTTPException(status_code=400, detail="Memory Master already assigned to this student")
-    
-    if not db_memory_master.availability:
-        raise HTTPException(status_code=400, detail="Memory Master is not available")
-    
-    db_memory_master.availability = False
-    db_student.memory_master_id = memory_master_id
+        db.rollback()
+        assignment_error(db, student_id, Student.memory_master_id, MemoryMaster, memory_master_id, "Memory Master")
     db.commit()
-    db.refresh(db_student)
-    db.refresh(db_memory_master)
+    catalog_cache.invalidate(memory_masters.CACHE_NAMESPACE)
     return db_student
 
+@retry_locked
 def change_memory_master(db: Session, student_id: int, memory_master_id: int) -> Student:
-    db_student = db.query(Student).filter(Student.id == student_id).first()
-    db_memory_master = db.query(MemoryMaster).filter(MemoryMaster.id == memory_master_id).first()
+    claimed = db.execute(claim_memory_master_statement(memory_master_id)).rowcount
+    if claimed:
+        db.execute(stats.increment(db, stats.assignment_source(MemoryMaster, student_id, memory_master_id, release=True)))
+        # Reset the previous Memory Master's availability
+        db.execute(release_memory_master_statement(student_id, memory_master_id))
+    db_student = claimed and db.execute(assign_memory_master_statement(student_id, memory_master_id)).first()
     if not db_student:
-        raise HTTPException(status_code=404, detail="Student not found")
-    
-    if db_student.memory_master_id == memory_master_id:
-        raise HTTPException(status_code=400, detail="Memory Master already assigned to this student")
-    
-    if not db_memory_master.availability:
-        raise HTTPException(status_code=400, detail="Memory Master is not available")
-    
-    # Reset the previous Memory Master's availability
-    if db_student.memory_master_id:
-        previous_memory_master = db.query(MemoryMaster).filter(MemoryMaster.id == db_student.memory_master_id).first()
-        previous_memory_master.availability = True
-    
-    db_memory_master.availability = False
-    db_student.memory_master_id = memory_master_id
+        db.rollback()
+        assignment_error(db, student_id, Student.memory_master_id, MemoryMaster, memory_master_id, "Memory Master")
     db.commit()
-    db.refresh(db_student)
+    catalog_cache.invalidate(memory_masters.CACHE_NAMESPACE)
     return db_student
+
+def claim_supervisor_statement(supervisor_id: int):
+    return (
+        sql_update(Supervisor)
+        .where(Supervisor.id == supervisor_id, Supervisor.availability > 0)
+        .values(availability=Supervisor.availability - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def assign_supervisor_statement(student_id: int, supervisor_id: int):
+    return (
+        sql_update(Student)
+        .where(Student.id == student_id, Student.supervisor_id.is_distinct_from(supervisor_id))
+        .values(supervisor_id=supervisor_id)
+        .returning(*PUBLIC_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+
+def claim_memory_master_statement(memory_master_id: int):
+    return (
+        sql_update(MemoryMaster)
+        .where(MemoryMaster.id == memory_master_id, MemoryMaster.availability.is_(True))
+        .values(availability=False)
+        .execution_options(synchronize_session=False)
+    )
+
+# Frees the student's current memory master, read in the same statement through a subquery
+def release_memory_master_statement(student_id: int, memory_master_id: int):
+    previous_id = select(Student.memory_master_id).where(Student.id == student_id).scalar_subquery()
+    return (
+        sql_update(MemoryMaster)
+        .where(MemoryMaster.id == previous_id, MemoryMaster.id != memory_master_id)
+        .values(availability=True)
+        .execution_options(synchronize_session=False)
+    )
+
+def assign_memory_master_statement(student_id: int, memory_master_id: int):
+    return (
+        sql_update(Student)
+        .where(Student.id == student_id, Student.memory_master_id.is_distinct_from(memory_master_id))
+        .values(memory_master_id=memory_master_id)
+        .returning(*PUBLIC_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+
+# Explain why an assignment did not go through (only runs after a failed claim)
+def assignment_error(db: Session, student_id: int, current_column, target_model, target_id: int, label: str):
+    current = db.execute(select(current_column).where(Student.id == student_id)).first()
+    if current is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    if current[0] == target_id:
+        raise HTTPException(status_code=400, detail=f"{label} already assigned to this student")
+    if db.get(target_model, target_id) is None:
+        raise HTTPException(status_code=404, detail=f"{label} not found")
+    raise HTTPException(status_code=400, detail=f"{label} is not available")
@@ -1,33 +1,122 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from cache import catalog_cache
+from crud.pagination import apply_keyset, keyset_order, split_page
+from crud.filtering import catalog_criteria, filters_key
+from crud.conditional import list_version, row_version
+from crud.bulk import BULK_BATCH_SIZE, validate_rows, insert_batches
+from crud.updates import changed_fields, update_returning
+from crud import stats
+from crud.retry import retry_locked
 from models import Supervisor
-from schemas import SupervisorBase, SupervisorCreate, SupervisorUpdate
+from schemas import SupervisorBase, SupervisorCreate, SupervisorUpdate, SupervisorPatch, BulkError, BulkResult, CatalogFilters
+
+# Cache namespace of supervisors reads, invalidated by every write touching a supervisor
+CACHE_NAMESPACE = "supervisors"
+
+# Columns exposed by the API
+PUBLIC_COLUMNS = [Supervisor.id, Supervisor.full_name, Supervisor.speciality, Supervisor.availability]
 
 # CRUD operations for Supervisor
-def get_all(db: Session, skip: int = 0, limit: int = 10) -> list[Supervisor]:
-    return db.query(Supervisor).offset(skip).limit(limit).all()
+def get_all(db: Session, skip: int = 0, limit: int = 10, options: list = (), filters: CatalogFilters | None = None) -> list[Supervisor]:
+    where, keys = list_criteria(filters)
+    return db.query(Supervisor).options(*options).filter(*where).order_by(*keyset_order(keys)).offset(skip).limit(limit).all()
+
+# Keyset pagination on the sort key and id: constant cost per page, stable under concurrent inserts
+def get_page(db: Session, cursor: str = "", limit: int = 10, options: list = (), filters: CatalogFilters | None = None) -> tuple[list[Supervisor], str | None]:
+    where, keys = list_criteria(filters)
+    rows = apply_keyset(db.query(Supervisor).options(*options).filter(*where), keys, cursor, limit).all()
+    return split_page(rows, keys, limit)
+
+# WHERE clauses and sort keys of a listing, served by ix_supervisors_speciality_availability and the full_name index
+def list_criteria(filters: CatalogFilters | None) -> tuple[list, list]:
+    return catalog_criteria(Supervisor, filters or CatalogFilters(), Supervisor.availability > 0, Supervisor.availability <= 0)
+
+# Plain-row readers backing the cache: column tuples, no ORM objects
+def get_all_rows(db: Session, skip: int = 0, limit: int = 10, filters: CatalogFilters | None = None) -> list[dict]:
+    where, keys = list_criteria(filters)
+    query = select(*PUBLIC_COLUMNS).where(*where).order_by(*keyset_order(keys)).offset(skip).limit(limit)
+    return [row._asdict() for row in db.execute(query)]
+
+def get_page_rows(db: Session, cursor: str = "", limit: int = 10, filters: CatalogFilters | None = None) -> tuple[list[dict], str | None]:
+    where, keys = list_criteria(filters)
+    rows, next_cursor = split_page(db.execute(apply_keyset(select(*PUBLIC_COLUMNS).where(*where), keys, cursor, limit)).all(), keys, limit)
+    return [row._asdict() for row in rows], next_cursor
+
+def get_row(db: Session, supervisor_id: int) -> dict | None:
+    row = db.execute(select(*PUBLIC_COLUMNS).where(Supervisor.id == supervisor_id)).first()
+    return row._asdict() if row else None
+
+# Cached reads, keyed by the filters as well
+def get_all_cached(db: Session, skip: int = 0, limit: int = 10, filters: CatalogFilters | None = None) -> list[dict]:
+    return catalog_cache.get_or_load(CACHE_NAMESPACE, f"all:{skip}:{limit}:{filters_key(filters)}", lambda: get_all_rows(db, skip, limit, filters))
+
+def get_page_cached(db: Session, cursor: str = "", limit: int = 10, filters: CatalogFilters | None = None) -> tuple[list[dict], str | None]:
+    return catalog_cache.get_or_load(CACHE_NAMESPACE, f"page:{cursor}:{limit}:{filters_key(filters)}", lambda: get_page_rows(db, cursor, limit, filters))
 
+def get_cached(db: Session, supervisor_id: int) -> dict | None:
+    return catalog_cache.get_or_load(CACHE_NAMESPACE, f"get:{supervisor_id}", lambda: get_row(db, supervisor_id))
+
+# Validators of the list and single reads, cached with them and invalidated by the same writes
+def list_version_cached(db: Session) -> dict:
+    return catalog_cache.get_or_load(CACHE_NAMESPACE, "version:list", lambda: list_version(db, Supervisor))
+
+def version_cached(db: Session, supervisor_id: int) -> dict | None:
+    return catalog_cache.get_or_load(CACHE_NAMESPACE, f"version:{supervisor_id}", lambda: row_version(db, Supervisor, supervisor_id))
+
+@retry_locked
 def create(db: Session, supervisor: SupervisorCreate) -> Supervisor:
     db_supervisor = Supervisor(
         full_name=supervisor.full_name,
         speciality=supervisor.speciality,
     )
     db.add(db_supervisor)
+    db.flush()
+    db.execute(stats.increment(db, stats.catalog_source(Supervisor, db_supervisor.id, 1)))
     db.commit()
+    catalog_cache.invalidate(CACHE_NAMESPACE)
     db.refresh(db_supervisor)
     return db_supervisor
 
-def get(db: Session, supervisor_id: int) -> Supervisor:
-    return db.query(Supervisor).filter(Supervisor.id == supervisor_id).first()
+# Bulk import in batched multi-row INSERTs, invalid rows are reported and skipped
+@retry_locked
+def bulk_create(db: Session, rows: list[dict], batch_size: int = BULK_BATCH_SIZE) -> BulkResult:
+    errors: list[BulkError] = []
+    valid = validate_rows(rows, SupervisorCreate, errors)
+    values = [{"full_name": supervisor.full_name, "speciality": supervisor.speciality} for _, supervisor in valid]
+    insert_batches(db, Supervisor, values, batch_size)
+    if values:
+        db.execute(stats.increment(db, stats.catalog_deltas(Supervisor, 1, [row["speciality"] for row in values])))
+    db.commit()
+    catalog_cache.invalidate(CACHE_NAMESPACE)
+    return BulkResult(created=len(values), errors=errors)
 
-def update(db: Session, supervisor_id: int, supervisor_update: SupervisorUpdate) -> Supervisor:
-    pass
+def get(db: Session, supervisor_id: int, options: list = ()) -> Supervisor:
+    return db.query(Supervisor).options(*options).filter(Supervisor.id == supervisor_id).first()
 
+# PUT and PATCH: one UPDATE ... RETURNING of the fields sent. A new speciality moves the row's
+# counters from the old speciality to the new one.
+@retry_locked
+def update(db: Session, supervisor_id: int, supervisor_update: SupervisorPatch) -> Supervisor:
+    changes = changed_fields(supervisor_update)
+    moved = "speciality" in changes
+    if moved:
+        db.execute(stats.increment(db, stats.catalog_source(Supervisor, supervisor_id, -1)))
+    db_supervisor = update_returning(db, Supervisor, supervisor_id, changes, PUBLIC_COLUMNS)
+    if moved:
+        db.execute(stats.increment(db, stats.catalog_source(Supervisor, supervisor_id, 1)))
+    db.commit()
+    if db_supervisor is not None:
+        catalog_cache.invalidate(CACHE_NAMESPACE)
+    return db_supervisor
+
+@retry_locked
 def delete(db: Session, supervisor_id: int) -> Supervisor:
     db_supervisor = db.query(Supervisor).filter(Supervisor.id == supervisor_id).first()
     if not db_supervisor:
         return None
+    db.execute(stats.increment(db, stats.deletion_source(Supervisor, supervisor_id)))
     db.delete(db_supervisor)
     db.commit()
+    catalog_cache.invalidate(CACHE_NAMESPACE)
     return db_supervisor
-
-
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+# Partial updates (PUT and PATCH).
+# Only the fields present in the request are SET, in a single UPDATE ... RETURNING without
+# reading the row first; updated_at is bumped by its onupdate. A None result means no such row.
+# The caller commits, after any other write of the same transaction.
+def changed_fields(body: BaseModel) -> dict:
+    return body.model_dump(exclude_unset=True, exclude_none=True)
+
+def update_returning(db: Session, model, row_id: int, changes: dict, columns: list):
+    if not changes:
+        return db.execute(select(*columns).where(model.id == row_id)).first()
+    statement = (
+        update(model)
+        .where(model.id == row_id)
+        .values(**changes)
+        .returning(*columns)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(statement).first()
@@ -1,6 +1,40 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from database import USE_ASYNC_DB, env_flag, get_engine, get_async_engine, dispose_engines, pool_stats
+from metrics import MetricsMiddleware, instrument_engine, metrics_response
+from migrate import upgrade
+
 import routers  # Assuming you have a users router defined in app/routers/users.py
 
-app = FastAPI( title="EduMaster API",)
+# Apply pending migrations on startup; turn off when `python migrate.py` runs before the workers
+DB_AUTO_MIGRATE = env_flag("DB_AUTO_MIGRATE", "1")
+
+# Importing the app does no database work: the engine is created and the schema brought up to
+# date here, once per worker, before the first request
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if USE_ASYNC_DB:
+        engine = get_async_engine()
+        if DB_AUTO_MIGRATE:
+            async with engine.begin() as connection:
+                await connection.run_sync(upgrade)
+        instrument_engine(engine.sync_engine)
+    else:
+        engine = get_engine()
+        if DB_AUTO_MIGRATE:
+            with engine.begin() as connection:
+                upgrade(connection)
+        instrument_engine(engine)
+    yield
+    await dispose_engines()
+
+app = FastAPI( title="EduMaster API", lifespan=lifespan)
 
 app.include_router(routers.router, prefix="/api")
+
+# Performance instrumentation, exported at /metrics for Prometheus
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return metrics_response(pool_stats())
@@ -0,0 +1,183 @@
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+
+# Request-level performance instrumentation:
+# per-route latency histograms, per-request query counts and DB time, an N+1 warning,
+# a slow-query log with redacted parameters and a Prometheus /metrics endpoint.
+
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "1.0"))  # fraction of requests instrumented
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "20"))  # SELECTs per request before warning
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger("edumaster.performance")
+
+# Stats of the request being served. Route handlers running in the threadpool get a copy of the
+# context holding the same object, so their queries are counted too.
+class RequestStats:
+    __slots__ = ("queries", "selects", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.selects = 0
+        self.db_seconds = 0.0
+
+_current_request: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("request_stats", default=None)
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: dict[tuple[str, str, int], Histogram] = {}
+        self.db_seconds: dict[tuple[str, str], float] = {}
+        self.queries: dict[tuple[str, str], int] = {}
+        self.slow_queries = 0
+        self.n_plus_one = 0
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            key = (method, route, status)
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.observe(seconds)
+            self.queries[(method, route)] = self.queries.get((method, route), 0) + stats.queries
+            self.db_seconds[(method, route)] = self.db_seconds.get((method, route), 0.0) + stats.db_seconds
+
+    def increment(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+registry = Registry()
+
+# SQLAlchemy hooks, attached to each engine serving requests
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if statement.lstrip()[:6].upper() == "SELECT":
+            stats.selects += 1
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        registry.increment("slow_queries")
+        # Only the statement is logged: bound parameters may hold emails or password hashes
+        logger.warning("Slow query (%.1f ms, %s parameters redacted): %s",
+                       elapsed * 1000, "batched" if executemany else "bound", " ".join(statement.split()))
+
+# A statement that raised never reaches after_cursor_execute: drop its start time, or it stays on
+# the pooled connection's stack
+def _handle_error(context):
+    connection = context.connection
+    if connection is not None and connection.info.get("query_start"):
+        connection.info["query_start"].pop()
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+# Plain ASGI middleware: no BaseHTTPMiddleware task/stream wrapping on the hot path
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (METRICS_SAMPLE_RATE < 1.0 and random.random() >= METRICS_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_request.reset(token)
+            # Route templates ("/api/students/{student_id}") keep label cardinality bounded
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            registry.record_request(scope["method"], route, status, elapsed, stats)
+            if stats.selects > N_PLUS_ONE_THRESHOLD:
+                registry.increment("n_plus_one")
+                logger.warning("Possible N+1: %s %s issued %d SELECTs", scope["method"], route, stats.selects)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+# Prometheus text exposition format
+def render(pool_stats: dict) -> str:
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    with registry._lock:
+        for (method, route, status), histogram in sorted(registry.latency.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, status=status, le=bound)} {cumulative}")
+            lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, status=status, le='+Inf')} {histogram.count}")
+            lines.append(f"http_request_duration_seconds_sum{_labels(method=method, route=route, status=status)} {histogram.sum:.6f}")
+            lines.append(f"http_request_duration_seconds_count{_labels(method=method, route=route, status=status)} {histogram.count}")
+        lines += ["# HELP db_queries_total SQL statements issued, by route.", "# TYPE db_queries_total counter"]
+        for (method, route), count in sorted(registry.queries.items()):
+            lines.append(f"db_queries_total{_labels(method=method, route=route)} {count}")
+        lines += ["# HELP db_query_duration_seconds_total Time spent in SQL statements, by route.", "# TYPE db_query_duration_seconds_total counter"]
+        for (method, route), seconds in sorted(registry.db_seconds.items()):
+            lines.append(f"db_query_duration_seconds_total{_labels(method=method, route=route)} {seconds:.6f}")
+        lines += [
+            "# HELP db_slow_queries_total Statements slower than SLOW_QUERY_MS.", "# TYPE db_slow_queries_total counter",
+            f"db_slow_queries_total {registry.slow_queries}",
+            "# HELP db_n_plus_one_requests_total Requests over N_PLUS_ONE_THRESHOLD SELECTs.", "# TYPE db_n_plus_one_requests_total counter",
+            f"db_n_plus_one_requests_total {registry.n_plus_one}",
+        ]
+    lines += [
+        "# HELP db_pool_checked_out Connections currently checked out.", "# TYPE db_pool_checked_out gauge",
+        f"db_pool_checked_out {pool_stats.get('checked_out', 0)}",
+        "# HELP db_pool_checkouts_total Connection checkouts.", "# TYPE db_pool_checkouts_total counter",
+        f"db_pool_checkouts_total {pool_stats['checkouts']}",
+        "# HELP db_pool_timeouts_total Checkouts that timed out.", "# TYPE db_pool_timeouts_total counter",
+        f"db_pool_timeouts_total {pool_stats['timeouts']}",
+        "# HELP db_pool_wait_seconds_total Time spent waiting for a connection.", "# TYPE db_pool_wait_seconds_total counter",
+        f"db_pool_wait_seconds_total {pool_stats['wait_seconds_total']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+def metrics_response(pool_stats: dict) -> PlainTextResponse:
+    return PlainTextResponse(render(pool_stats), media_type="text/plain; version=0.0.4")
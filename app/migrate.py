@@ -0,0 +1,58 @@
+import os
+import re
+from sqlalchemy import inspect, text
+from database import get_engine
+
+# Versioned schema migrations (alembic.ini, migrations/), applied by main's lifespan when
+# DB_AUTO_MIGRATE is on, or with `python migrate.py` before starting the workers.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ALEMBIC_INI = os.path.join(APP_DIR, "alembic.ini")
+VERSIONS_DIR = os.path.join(APP_DIR, "migrations", "versions")
+BASELINE_REVISION = "0001"
+
+_REVISION = re.compile(r"^revision\s*=\s*['\"](\w+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision\s*=\s*(.*)$", re.MULTILINE)
+
+def alembic_config(connection=None):
+    from alembic.config import Config  # imported on demand: ~150 ms, only paid when upgrading
+    config = Config(ALEMBIC_INI)
+    config.attributes["connection"] = connection
+    return config
+
+# Head revisions read from the revision files, without importing alembic
+def script_heads() -> set[str]:
+    revisions, parents = set(), set()
+    for name in os.listdir(VERSIONS_DIR):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(VERSIONS_DIR, name)) as file:
+            source = file.read()
+        revision, down_revision = _REVISION.search(source), _DOWN_REVISION.search(source)
+        if revision:
+            revisions.add(revision.group(1))
+        if down_revision:
+            parents.update(re.findall(r"['\"](\w+)['\"]", down_revision.group(1)))
+    return revisions - parents
+
+def is_current(connection) -> bool:
+    if not inspect(connection).has_table("alembic_version"):
+        return False
+    versions = set(connection.execute(text("SELECT version_num FROM alembic_version")).scalars())
+    return versions == script_heads()
+
+# Upgrades to the latest revision on an open connection; an up-to-date database costs one
+# query. Databases created by the former create_all have the baseline tables but no version
+# table: they are stamped at the baseline first.
+def upgrade(connection):
+    if is_current(connection):
+        return
+    from alembic import command
+    config = alembic_config(connection)
+    tables = inspect(connection).get_table_names()
+    if "alembic_version" not in tables and "students" in tables:
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
+if __name__ == "__main__":
+    with get_engine().begin() as connection:
+        upgrade(connection)
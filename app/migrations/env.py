@@ -0,0 +1,30 @@
+from alembic import context
+from database import DATABASE_URL, Base, get_engine
+import models  # registers the tables on Base.metadata
+
+target_metadata = Base.metadata
+
+# render_as_batch: SQLite cannot ALTER most column properties, batch mode rebuilds the table
+def run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_offline():
+    context.configure(url=DATABASE_URL, target_metadata=target_metadata, literal_binds=True, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+# migrate.upgrade passes its own connection (the app's engine, sync or async)
+def run_migrations_online():
+    connection = context.config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+    with get_engine().begin() as connection:
+        run_migrations(connection)
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,54 @@
+"""Baseline: the schema created by the former create_all on startup
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "supervisors",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("speciality", sa.String(), nullable=True),
+        sa.Column("availability", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_supervisors_full_name", "supervisors", ["full_name"])
+    op.create_table(
+        "memory_masters",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("speciality", sa.String(), nullable=True),
+        sa.Column("availability", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_memory_masters_full_name", "memory_masters", ["full_name"])
+    op.create_table(
+        "students",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Integer(), nullable=False),
+        sa.Column("is_admin", sa.Integer(), nullable=False),
+        sa.Column("supervisor_id", sa.Integer(), nullable=True),
+        sa.Column("memory_master_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["supervisor_id"], ["supervisors.id"]),
+        sa.ForeignKeyConstraint(["memory_master_id"], ["memory_masters.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_students_full_name", "students", ["full_name"], unique=True)
+    op.create_index("ix_students_email", "students", ["email"], unique=True)
+
+def downgrade():
+    op.drop_table("students")
+    op.drop_table("memory_masters")
+    op.drop_table("supervisors")
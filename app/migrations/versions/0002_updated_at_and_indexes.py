@@ -0,0 +1,51 @@
+"""updated_at row versions, catalog filter and student foreign key indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Databases created by create_all after these were added to models.py already have some of
+them, so each column and index is only created when missing.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+TABLES = ("students", "supervisors", "memory_masters")
+
+INDEXES = [
+    ("ix_students_updated_at", "students", ["updated_at"]),
+    ("ix_supervisors_updated_at", "supervisors", ["updated_at"]),
+    ("ix_memory_masters_updated_at", "memory_masters", ["updated_at"]),
+    ("ix_students_supervisor_id", "students", ["supervisor_id"]),
+    ("ix_students_memory_master_id", "students", ["memory_master_id"]),
+    ("ix_supervisors_speciality_availability", "supervisors", ["speciality", "availability"]),
+    ("ix_memory_masters_speciality_availability", "memory_masters", ["speciality", "availability"]),
+]
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        columns = {column["name"]: column for column in inspector.get_columns(table)}
+        if "updated_at" not in columns:
+            op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+            # Existing rows get a version, or list validators would ignore them
+            op.execute(sa.table(table, sa.column("updated_at")).update().values(updated_at=sa.func.current_timestamp()))
+        if "updated_at" not in columns or columns["updated_at"]["nullable"]:
+            with op.batch_alter_table(table) as batch:
+                batch.alter_column("updated_at", existing_type=sa.DateTime(), nullable=False)
+    existing = {index["name"] for table in TABLES for index in inspector.get_indexes(table)}
+    for name, table, index_columns in INDEXES:
+        if name not in existing:
+            op.create_index(name, table, index_columns)
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("updated_at")
@@ -0,0 +1,49 @@
+"""stats_counters: incrementally maintained aggregates of /stats
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+The table may already exist (create_all) but its counters are always recomputed from the
+GROUP BY queries, since no write maintained them before this revision.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+students = sa.table("students", sa.column("supervisor_id"), sa.column("memory_master_id"))
+supervisors = sa.table("supervisors", sa.column("speciality"), sa.column("availability", sa.Integer()))
+memory_masters = sa.table("memory_masters", sa.column("speciality"), sa.column("availability", sa.Boolean()))
+counters = sa.table("stats_counters", sa.column("name"), sa.column("speciality"), sa.column("value"))
+
+def backfill_queries():
+    yield sa.select(sa.literal("students"), sa.literal(""), sa.func.count()).select_from(students)
+    yield sa.select(sa.literal("students_without_supervisor"), sa.literal(""), sa.func.count()).where(students.c.supervisor_id.is_(None))
+    yield sa.select(sa.literal("students_without_memory_master"), sa.literal(""), sa.func.count()).where(students.c.memory_master_id.is_(None))
+    for table, count_name, capacity_name, capacity in (
+        (supervisors, "supervisors", "supervisor_capacity", supervisors.c.availability),
+        (memory_masters, "memory_masters", "memory_masters_available", sa.cast(memory_masters.c.availability, sa.Integer())),
+    ):
+        speciality = sa.func.coalesce(table.c.speciality, "")
+        yield sa.select(sa.literal(count_name), speciality, sa.func.count()).group_by(speciality)
+        yield sa.select(sa.literal(capacity_name), speciality, sa.func.coalesce(sa.func.sum(capacity), 0)).group_by(speciality)
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table("stats_counters"):
+        op.create_table(
+            "stats_counters",
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("speciality", sa.String(), nullable=False),
+            sa.Column("value", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("name", "speciality"),
+        )
+    op.execute(counters.delete())
+    for query in backfill_queries():
+        op.execute(counters.insert().from_select(["name", "speciality", "value"], query))
+
+def downgrade():
+    op.drop_table("stats_counters")
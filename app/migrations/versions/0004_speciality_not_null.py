@@ -0,0 +1,35 @@
+"""speciality NOT NULL on supervisors and memory masters, as declared in models.py
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+The baseline kept the nullable column of the databases created by create_all, though the API
+always required a speciality. Rows without one get "", the value /stats already counted them
+under, and tables already created NOT NULL (create_all after models.py changed) are left as is.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+TABLES = ("supervisors", "memory_masters")
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        columns = {column["name"]: column for column in inspector.get_columns(table)}
+        if not columns["speciality"]["nullable"]:
+            continue
+        speciality = sa.table(table, sa.column("speciality"))
+        op.execute(speciality.update().where(speciality.c.speciality.is_(None)).values(speciality=""))
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("speciality", existing_type=sa.String(), nullable=False)
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("speciality", existing_type=sa.String(), nullable=True)
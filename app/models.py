@@ -1,8 +1,14 @@
-from sqlalchemy import Integer, String, ForeignKey, Boolean
+from datetime import datetime, timezone
+from sqlalchemy import Integer, String, ForeignKey, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from database import Base
 from typing import List
 
+# Row version: set on insert and on every UPDATE (ORM and Core statements alike), with
+# microsecond resolution so that count + max(updated_at) changes whenever a table does
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class Student(Base):
     __tablename__ = "students"
 
@@ -12,8 +18,9 @@ class Student(Base):
     hashed_password: Mapped[str]  = mapped_column(String)
     is_active: Mapped[int] = mapped_column(Integer, default=1)  # 1 for active, 0 for inactive
     is_admin: Mapped[int] = mapped_column(Integer, default=0)  # 1 for admin, 0 for regular user
-    supervisor_id: Mapped[int] = mapped_column(ForeignKey("supervisors.id"), nullable=True)
-    memory_master_id: Mapped[int] = mapped_column(ForeignKey("memory_masters.id"), nullable=True)
+    supervisor_id: Mapped[int] = mapped_column(ForeignKey("supervisors.id"), nullable=True, index=True)
+    memory_master_id: Mapped[int] = mapped_column(ForeignKey("memory_masters.id"), nullable=True, index=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, onupdate=utcnow, index=True)
     supervisor: Mapped["Supervisor"] = relationship("Supervisor", back_populates="students")
     memory_master: Mapped["MemoryMaster"] = relationship("MemoryMaster", back_populates="students")
     
@@ -24,7 +31,11 @@ class Supervisor(Base):
     full_name: Mapped[str] = mapped_column(String, index=True)
     speciality: Mapped[str] = mapped_column(String, nullable=False)
     availability: Mapped[int] = mapped_column(Integer, default=3)  
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, onupdate=utcnow, index=True)
     students: Mapped[List["Student"]] = relationship("Student", back_populates="supervisor")
+
+    # speciality equals/in with an availability filter, the common catalog query
+    __table_args__ = (Index("ix_supervisors_speciality_availability", "speciality", "availability"),)
     
 class MemoryMaster(Base):
     __tablename__ = "memory_masters"
@@ -33,4 +44,16 @@ class MemoryMaster(Base):
     full_name: Mapped[str] = mapped_column(String, index=True)
     speciality: Mapped[str] = mapped_column(String, nullable=False)
     availability: Mapped[bool] = mapped_column(Boolean, default=True)
-    students: Mapped[List["Student"]] = relationship("Student", back_populates="memory_master")
\ No newline at end of file
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, onupdate=utcnow, index=True)
+    students: Mapped[List["Student"]] = relationship("Student", back_populates="memory_master")
+
+    __table_args__ = (Index("ix_memory_masters_speciality_availability", "speciality", "availability"),)
+
+# Incrementally maintained aggregates behind /stats: one row per counter and speciality ("" for
+# the global ones), moved by deltas in the transaction of every write that changes them
+class StatCounter(Base):
+    __tablename__ = "stats_counters"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    speciality: Mapped[str] = mapped_column(String, primary_key=True, default="")
+    value: Mapped[int] = mapped_column(Integer, default=0)
@@ -0,0 +1,124 @@
+import math
+import os
+import threading
+import time
+from fastapi import HTTPException, Request
+from database import WEB_CONCURRENCY, env_flag, shared_backend
+
+# Token bucket rate limiting.
+# A bucket holds up to `burst` tokens and refills at `rate` tokens per second; a request takes one
+# token or is rejected with a 429 and a Retry-After. Limits are checked before any database or
+# bcrypt work: per client IP and per email on /login/ and /register/, per user on JWT routes.
+#
+# RATE_LIMIT_BACKEND: "memory" (per-process), "redis" (REDIS_URL, shared between workers) or
+# "none". The default is "memory", or "redis" with several workers and REDIS_URL set.
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", shared_backend("memory") if env_flag("RATE_LIMIT_ENABLED", "1") else "none")
+RATE_LIMIT_EVICT_SECONDS = float(os.getenv("RATE_LIMIT_EVICT_SECONDS", "60"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# In-process buckets with several workers: each refills at its share of the rate, so the sustained
+# total stays at the configured rate however the kernel spreads connections. The burst is not
+# divided: a client kept on one worker by keep-alive would otherwise get a burst of 1.
+WORKER_SHARE = 1 / WEB_CONCURRENCY if RATE_LIMIT_BACKEND == "memory" else 1.0
+
+# (tokens per second, burst)
+AUTH_IP_LIMIT = (float(os.getenv("AUTH_IP_RATE", "1")), float(os.getenv("AUTH_IP_BURST", "20")))
+AUTH_EMAIL_LIMIT = (float(os.getenv("AUTH_EMAIL_RATE", "0.1")), float(os.getenv("AUTH_EMAIL_BURST", "5")))
+USER_LIMIT = (float(os.getenv("USER_RATE", "20")), float(os.getenv("USER_BURST", "100")))
+
+class MemoryBuckets:
+    def __init__(self, evict_seconds: float = RATE_LIMIT_EVICT_SECONDS):
+        # key -> [tokens, updated_at, seconds until full]: constant memory per active key
+        self._buckets: dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._evict_seconds = evict_seconds
+        self._next_eviction = time.monotonic() + evict_seconds
+
+    # Take a token, returning 0 or the seconds to wait for the next one
+    def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_eviction:
+                self._evict(now)
+            bucket = self._buckets.get(key)
+            tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+            if tokens < 1:
+                self._buckets[key] = [tokens, now, (burst - tokens) / rate]
+                return (1 - tokens) / rate
+            tokens -= 1
+            self._buckets[key] = [tokens, now, (burst - tokens) / rate]
+            return 0.0
+
+    # Buckets that have refilled completely are indistinguishable from missing ones
+    def _evict(self, now: float):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < bucket[2]}
+        self._next_eviction = now + self._evict_seconds
+
+    def __len__(self):
+        return len(self._buckets)
+
+# Same algorithm in one atomic Lua script, the bucket expiring once it would be full again
+TOKEN_BUCKET_SCRIPT = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = burst
+if bucket[1] then
+    tokens = math.min(burst, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+end
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+else
+    tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+return tostring(wait)
+"""
+
+class RedisBuckets:
+    def __init__(self, client):
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        return float(self._script(keys=[f"ratelimit:{key}"], args=[rate, burst, time.time()]))
+
+class NoBuckets:
+    def take(self, key: str, rate: float, burst: float) -> float:
+        return 0.0
+
+def make_buckets(name: str):
+    if name == "redis":
+        import redis  # optional dependency, only needed for the shared backend
+        return RedisBuckets(redis.Redis.from_url(REDIS_URL))
+    if name == "none":
+        return NoBuckets()
+    return MemoryBuckets()
+
+buckets = make_buckets(RATE_LIMIT_BACKEND)
+
+def limit(key: str, rule: tuple[float, float]):
+    rate, burst = rule
+    wait = buckets.take(key, rate * WORKER_SHARE, burst)
+    if wait > 0:
+        raise HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": str(math.ceil(wait))})
+
+# The proxy's address unless uvicorn trusts it (FORWARDED_ALLOW_IPS, see serve.py) and replaced
+# it with the client's from X-Forwarded-For
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+# Dependency of /login/ and /register/, resolved before the body is handled
+def limit_auth_ip(request: Request):
+    limit(f"auth-ip:{client_ip(request)}", AUTH_IP_LIMIT)
+
+# Called first thing in the auth routes, once the email is known
+def limit_auth_email(email: str):
+    limit(f"auth-email:{email.lower()}", AUTH_EMAIL_LIMIT)
+
+# Called by JWTBearer once the token is verified; a request takes a single token however many
+# JWTBearer dependencies it has
+def limit_user(request: Request, user_id):
+    if getattr(request.state, "rate_limited", False):
+        return
+    request.state.rate_limited = True
+    limit(f"user:{user_id}", USER_LIMIT)
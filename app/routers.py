@@ -1,153 +1,316 @@
-from fastapi import APIRouter, Depends, HTTPException
+import inspect
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, Base
-from crud import auth, students, supervisors, memory_masters
-from schemas import Token, StudentLogin, Student, StudentCreate, StudentUpdate, Supervisor, SupervisorCreate, SupervisorUpdate, MemoryMaster, MemoryMasterCreate, MemoryMasterUpdate
+from database import USE_ASYNC_DB, get_db, get_async_db, pool_stats
+from crud import auth
+from schemas import Token, StudentLogin, Student, StudentCreate, StudentUpdate, StudentPatch, Supervisor, SupervisorCreate, SupervisorUpdate, SupervisorPatch, MemoryMaster, MemoryMasterCreate, MemoryMasterUpdate, MemoryMasterPatch, BulkResult, StudentExpanded, SupervisorExpanded, MemoryMasterExpanded, CatalogFilters, StudentFilters, MatchingRequest, MatchingResult, Stats
 from crud.auth import JWTBearer
+from ratelimit import limit_auth_ip, limit_auth_email
+from crud import matching, stats
+from crud.pagination import page_response
+from crud.filtering import catalog_filters, student_filters
+from crud.responses import FAST_JSON, fast_json_response
+from crud.conditional import conditional_response
+from crud.bulk import BULK_BATCH_SIZE, read_bulk_rows
+from crud.relations import (
+    STUDENT_EXPANSIONS, SUPERVISOR_EXPANSIONS, MEMORY_MASTER_EXPANSIONS,
+    parse_expand, expanded_response, student_options, supervisor_options, memory_master_options,
+)
+from crud.export import ExportFormat, export_response
+from crud.students import PUBLIC_COLUMNS as STUDENT_COLUMNS
+from crud.supervisors import PUBLIC_COLUMNS as SUPERVISOR_COLUMNS
+from crud.memory_masters import PUBLIC_COLUMNS as MEMORY_MASTER_COLUMNS
 
-router = APIRouter()
+# USE_ASYNC_DB picks the session and CRUD modules behind the same routes: the crud.async_*
+# modules on an AsyncSession, or the sync ones on a Session
+if USE_ASYNC_DB:
+    from crud import async_students as students, async_supervisors as supervisors, async_memory_masters as memory_masters
+    from crud.export import stream_rows_async as stream_rows
+    DbSession, get_session = AsyncSession, get_async_db
+    current_user, require_admin = auth.current_user_async, auth.require_admin_async
+else:
+    from crud import students, supervisors, memory_masters
+    from crud.export import stream_rows
+    DbSession, get_session = Session, get_db
+    current_user, require_admin = auth.current_user, auth.require_admin
 
-# Create the database tables
-Base.metadata.create_all(bind=engine)
+# Calls a CRUD function taking the session first. Async ones are awaited; sync ones run in the
+# threadpool like a def route, or through run_sync on an AsyncSession.
+async def call(function, db, *args, **kwargs):
+    if inspect.iscoroutinefunction(function):
+        return await function(db, *args, **kwargs)
+    if USE_ASYNC_DB:
+        return await db.run_sync(function, *args, **kwargs)
+    return await run_in_threadpool(function, db, *args, **kwargs)
 
-# Dependency to get the database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-        
+router = APIRouter()
 
-@router.post("/register/", response_model=Student, tags=["User Registration"])
-def register_student(student: StudentCreate, db: Session = Depends(get_db)):
-    response = students.create(db, student)
+@router.post("/register/", dependencies=[Depends(limit_auth_ip)], response_model=Student, tags=["User Registration"])
+async def register_student(student: StudentCreate, db: DbSession = Depends(get_session)):
+    limit_auth_email(student.email)
+    response = await call(students.create, db, student)
     return response
 
-@router.post("/login/", response_model=Token, tags=["User Registration"])
-def login_student(student: StudentLogin, db: Session = Depends(get_db)):
-    response = students.login(db, student)
+@router.post("/login/", dependencies=[Depends(limit_auth_ip)], response_model=Token, tags=["User Registration"])
+async def login_student(student: StudentLogin, db: DbSession = Depends(get_session)):
+    limit_auth_email(student.email)
+    response = await call(students.login, db, student)
     if response is None:
         raise HTTPException(status_code=400, detail="Invalid email or password")
-    return auth.sign_jwt(response.id)
+    return auth.sign_jwt(response.id, response.is_admin, response.is_active)
 
 @router.get("/students/me", response_model=Student, tags=["User Registration"])
-def get_my_profile(db: Session = Depends(get_db),student_id: int = Depends(auth.get_current_user_id)):
-    student = students.get(db, student_id)
+async def get_my_profile(db: DbSession = Depends(get_session),student_id: int = Depends(auth.get_current_user_id)):
+    student = await call(students.get, db, student_id)
     if student is None:
         raise HTTPException(status_code=404, detail="Student not found")
     return student
         
-@router.get("/students/", response_model=list[Student], dependencies=[Depends(JWTBearer())], tags=["Students"])
-def get_all_students(skip: int = 0, limit: int = 10, db: Session = Depends(get_db),student_id: int = Depends(auth.get_current_user_id)):
-    user = students.get(db, student_id)
-    if user.is_admin == 0:
-        raise HTTPException(status_code=403, detail="Access forbidden: Only admins can view all students")
-    response = students.get_all(db, skip=skip, limit=limit)
-    return response
+@router.get("/students/", response_model=list[Student], dependencies=[Depends(JWTBearer()), Depends(require_admin)], tags=["Students"])
+async def get_all_students(response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, expand: Optional[str] = None, filters: StudentFilters = Depends(student_filters), db: DbSession = Depends(get_session)):
+    expanded = parse_expand(expand, STUDENT_EXPANSIONS)
+    if FAST_JSON and not expanded:
+        if cursor is not None:
+            return fast_json_response(page_response(response, await call(students.get_page_rows, db, cursor=cursor, limit=limit, filters=filters)), response.headers)
+        return fast_json_response(await call(students.get_all_rows, db, skip=skip, limit=limit, filters=filters), response.headers)
+    options = student_options(expanded)
+    if cursor is not None:
+        response_rows = page_response(response, await call(students.get_page, db, cursor=cursor, limit=limit, options=options, filters=filters))
+    else:
+        response_rows = await call(students.get_all, db, skip=skip, limit=limit, options=options, filters=filters)
+    if expanded:
+        return expanded_response(response_rows, StudentExpanded, expanded, STUDENT_EXPANSIONS, response.headers)
+    return response_rows
+
+@router.get("/students/export", dependencies=[Depends(JWTBearer()), Depends(require_admin)], tags=["Students"])
+async def export_students(format: ExportFormat = "ndjson"):
+    return export_response(stream_rows(STUDENT_COLUMNS, format), "students", format)
+
+@router.post("/students/bulk", response_model=BulkResult, dependencies=[Depends(JWTBearer()), Depends(require_admin)], tags=["Students"])
+async def bulk_create_students(rows: list[dict] = Depends(read_bulk_rows), batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=5000), db: DbSession = Depends(get_session)):
+    return await call(students.bulk_create, db, rows, batch_size)
+
+@router.post("/students/matching", response_model=MatchingResult, dependencies=[Depends(JWTBearer()), Depends(require_admin)], tags=["Students"])
+async def match_students(request: MatchingRequest, db: DbSession = Depends(get_session)):
+    return await call(matching.run, db, request)
 
 @router.get("/students/{student_id}", response_model=Student, dependencies=[Depends(JWTBearer())], tags=["Students"])
-def read_student(student_id: int, db: Session = Depends(get_db)):
-    response = students.get(db, student_id)
-    return response
+async def read_student(request: Request, response: Response, student_id: int, expand: Optional[str] = None, db: DbSession = Depends(get_session)):
+    expanded = parse_expand(expand, STUDENT_EXPANSIONS)
+    if expanded:
+        response_row = await call(students.get, db, student_id, options=student_options(expanded))
+        if response_row is None:
+            raise HTTPException(status_code=404, detail="Student not found")
+        return expanded_response(response_row, StudentExpanded, expanded, STUDENT_EXPANSIONS)
+    not_modified = conditional_response(request, response, await call(students.version, db, student_id))
+    if not_modified:
+        return not_modified
+    response_row = await call(students.get, db, student_id)
+    if response_row is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return response_row
 
 @router.put("/students/{student_id}", response_model=Student, dependencies=[Depends(JWTBearer())], tags=["Students"])
-def update_student(student_id: int, student_update: StudentUpdate, db: Session = Depends(get_db)):
-    response = students.update(db, student_id, student_update)
+async def update_student(student_id: int, student_update: StudentUpdate, user: auth.CurrentUser = Depends(current_user), db: DbSession = Depends(get_session)):
+    student_update = auth.authorize_student_update(user, student_id, student_update)
+    response = await call(students.update, db, student_id, student_update)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return response
+
+@router.patch("/students/{student_id}", response_model=Student, dependencies=[Depends(JWTBearer())], tags=["Students"])
+async def patch_student(student_id: int, student_patch: StudentPatch, user: auth.CurrentUser = Depends(current_user), db: DbSession = Depends(get_session)):
+    student_patch = auth.authorize_student_update(user, student_id, student_patch)
+    response = await call(students.update, db, student_id, student_patch)
     if response is None:
         raise HTTPException(status_code=404, detail="Student not found")
     return response
 
 @router.delete("/students/{student_id}", response_model=Student, dependencies=[Depends(JWTBearer())], tags=["Students"])
-def delete_student(student_id: int, db: Session = Depends(get_db)):
-    response = students.delete(db, student_id)
+async def delete_student(student_id: int, db: DbSession = Depends(get_session)):
+    response = await call(students.delete, db, student_id)
     if response is None:
         raise HTTPException(status_code=404, detail="Student not found")
     return response
 
 @router.post("/students/me/choose_supervisor/{supervisor_id}", response_model=Student, dependencies=[Depends(JWTBearer())], tags=["Students"])
-def choose_supervisor(supervisor_id: int, student_id: int = Depends(auth.get_current_user_id), db: Session = Depends(get_db)):
-    response = students.choose_supervisor(db, student_id, supervisor_id)
+async def choose_supervisor(supervisor_id: int, student_id: int = Depends(auth.get_current_user_id), db: DbSession = Depends(get_session)):
+    response = await call(students.choose_supervisor, db, student_id, supervisor_id)
     if response is None:
         raise HTTPException(status_code=404, detail="Student or Supervisor not found")
     return response
 
 @router.post("/students/me/choose_memory_master/{memory_master_id}", response_model=Student, dependencies=[Depends(JWTBearer())], tags=["Students"])
-def choose_memory_master(memory_master_id: int, student_id: int = Depends(auth.get_current_user_id), db: Session = Depends(get_db)):
-    response = students.choose_memory_master(db, student_id, memory_master_id)
+async def choose_memory_master(memory_master_id: int, student_id: int = Depends(auth.get_current_user_id), db: DbSession = Depends(get_session)):
+    response = await call(students.choose_memory_master, db, student_id, memory_master_id)
     if response is None:
         raise HTTPException(status_code=404, detail="Student or Memory Master not found")
     return response
 
 @router.put("/students/me/change_memory_master/{memory_master_id}", response_model=Student, dependencies=[Depends(JWTBearer())], tags=["Students"])
-def change_memory_master(memory_master_id: int, student_id: int = Depends(auth.get_current_user_id), db: Session = Depends(get_db)):
-    response = students.change_memory_master(db, student_id, memory_master_id)
+async def change_memory_master(memory_master_id: int, student_id: int = Depends(auth.get_current_user_id), db: DbSession = Depends(get_session)):
+    response = await call(students.change_memory_master, db, student_id, memory_master_id)
     if response is None:
         raise HTTPException(status_code=404, detail="Student or Memory Master not found")
     return response
 
 @router.get("/supervisors/", response_model=list[Supervisor], dependencies=[Depends(JWTBearer())], tags=["Supervisors"])
-def get_all_supervisors(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    response = supervisors.get_all(db, skip=skip, limit=limit)
-    return response
+async def get_all_supervisors(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, expand: Optional[str] = None, filters: CatalogFilters = Depends(catalog_filters), db: DbSession = Depends(get_session)):
+    expanded = parse_expand(expand, SUPERVISOR_EXPANSIONS)
+    if expanded:
+        options = supervisor_options(expanded)
+        if cursor is not None:
+            response_rows = page_response(response, await call(supervisors.get_page, db, cursor=cursor, limit=limit, options=options, filters=filters))
+        else:
+            response_rows = await call(supervisors.get_all, db, skip=skip, limit=limit, options=options, filters=filters)
+        return expanded_response(response_rows, SupervisorExpanded, expanded, SUPERVISOR_EXPANSIONS, response.headers)
+    not_modified = conditional_response(request, response, await call(supervisors.list_version_cached, db))
+    if not_modified:
+        return not_modified
+    if cursor is not None:
+        response_rows = page_response(response, await call(supervisors.get_page_cached, db, cursor=cursor, limit=limit, filters=filters))
+    else:
+        response_rows = await call(supervisors.get_all_cached, db, skip=skip, limit=limit, filters=filters)
+    if FAST_JSON:
+        return fast_json_response(response_rows, response.headers)
+    return response_rows
 
 @router.post("/supervisors/", response_model=Supervisor, dependencies=[Depends(JWTBearer())], tags=["Supervisors"])
-def create_supervisor(supervisor: SupervisorCreate, db: Session = Depends(get_db)):
-    response = supervisors.create(db, supervisor)
+async def create_supervisor(supervisor: SupervisorCreate, db: DbSession = Depends(get_session)):
+    response = await call(supervisors.create, db, supervisor)
     return response
 
+@router.post("/supervisors/bulk", response_model=BulkResult, dependencies=[Depends(JWTBearer())], tags=["Supervisors"])
+async def bulk_create_supervisors(rows: list[dict] = Depends(read_bulk_rows), batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=5000), db: DbSession = Depends(get_session)):
+    return await call(supervisors.bulk_create, db, rows, batch_size)
+
+@router.get("/supervisors/export", dependencies=[Depends(JWTBearer())], tags=["Supervisors"])
+async def export_supervisors(format: ExportFormat = "ndjson"):
+    return export_response(stream_rows(SUPERVISOR_COLUMNS, format), "supervisors", format)
+
 @router.get("/supervisors/{supervisor_id}", response_model=Supervisor, dependencies=[Depends(JWTBearer())], tags=["Supervisors"])
-def read_supervisor(supervisor_id: int, db: Session = Depends(get_db)):
-    response = supervisors.get(db, supervisor_id)
+async def read_supervisor(request: Request, response: Response, supervisor_id: int, expand: Optional[str] = None, db: DbSession = Depends(get_session)):
+    expanded = parse_expand(expand, SUPERVISOR_EXPANSIONS)
+    if expanded:
+        response_row = await call(supervisors.get, db, supervisor_id, options=supervisor_options(expanded))
+        if response_row is None:
+            raise HTTPException(status_code=404, detail="Supervisor not found")
+        return expanded_response(response_row, SupervisorExpanded, expanded, SUPERVISOR_EXPANSIONS)
+    not_modified = conditional_response(request, response, await call(supervisors.version_cached, db, supervisor_id))
+    if not_modified:
+        return not_modified
+    response_row = await call(supervisors.get_cached, db, supervisor_id)
+    if response_row is None:
+        raise HTTPException(status_code=404, detail="Supervisor not found")
+    return response_row
+
+@router.put("/supervisors/{supervisor_id}", response_model=Supervisor, dependencies=[Depends(JWTBearer())], tags=["Supervisors"])
+async def update_supervisor(supervisor_id: int, supervisor_update: SupervisorUpdate, db: DbSession = Depends(get_session)):
+    response = await call(supervisors.update, db, supervisor_id, supervisor_update)
     if response is None:
         raise HTTPException(status_code=404, detail="Supervisor not found")
     return response
 
-@router.put("/supervisors/{supervisor_id}", response_model=Supervisor, dependencies=[Depends(JWTBearer())], tags=["Supervisors"])
-def update_supervisor(supervisor_id: int, supervisor_update: supervisors.SupervisorUpdate, db: Session = Depends(get_db)):
-    response = supervisors.update(db, supervisor_id, supervisor_update)
+@router.patch("/supervisors/{supervisor_id}", response_model=Supervisor, dependencies=[Depends(JWTBearer())], tags=["Supervisors"])
+async def patch_supervisor(supervisor_id: int, supervisor_patch: SupervisorPatch, db: DbSession = Depends(get_session)):
+    response = await call(supervisors.update, db, supervisor_id, supervisor_patch)
     if response is None:
         raise HTTPException(status_code=404, detail="Supervisor not found")
     return response
 
 @router.delete("/supervisors/{supervisor_id}", response_model=Supervisor, dependencies=[Depends(JWTBearer())], tags=["Supervisors"])
-def delete_supervisor(supervisor_id: int, db: Session = Depends(get_db)):
-    response = supervisors.delete(db, supervisor_id)
+async def delete_supervisor(supervisor_id: int, db: DbSession = Depends(get_session)):
+    response = await call(supervisors.delete, db, supervisor_id)
     if response is None:
         raise HTTPException(status_code=404, detail="Supervisor not found")
     return response
 
 @router.get("/memory_masters/", response_model=list[MemoryMaster], dependencies=[Depends(JWTBearer())], tags=["Memory Masters"])
-def get_all_memory_masters(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    response = memory_masters.get_all(db, skip=skip, limit=limit)
-    return response
+async def get_all_memory_masters(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, expand: Optional[str] = None, filters: CatalogFilters = Depends(catalog_filters), db: DbSession = Depends(get_session)):
+    expanded = parse_expand(expand, MEMORY_MASTER_EXPANSIONS)
+    if expanded:
+        options = memory_master_options(expanded)
+        if cursor is not None:
+            response_rows = page_response(response, await call(memory_masters.get_page, db, cursor=cursor, limit=limit, options=options, filters=filters))
+        else:
+            response_rows = await call(memory_masters.get_all, db, skip=skip, limit=limit, options=options, filters=filters)
+        return expanded_response(response_rows, MemoryMasterExpanded, expanded, MEMORY_MASTER_EXPANSIONS, response.headers)
+    not_modified = conditional_response(request, response, await call(memory_masters.list_version_cached, db))
+    if not_modified:
+        return not_modified
+    if cursor is not None:
+        response_rows = page_response(response, await call(memory_masters.get_page_cached, db, cursor=cursor, limit=limit, filters=filters))
+    else:
+        response_rows = await call(memory_masters.get_all_cached, db, skip=skip, limit=limit, filters=filters)
+    if FAST_JSON:
+        return fast_json_response(response_rows, response.headers)
+    return response_rows
 
 @router.post("/memory_masters/", response_model=MemoryMaster, dependencies=[Depends(JWTBearer())], tags=["Memory Masters"])
-def create_memory_master(memory_master: MemoryMasterCreate, db: Session = Depends(get_db)):
-    response = memory_masters.create(db, memory_master)
+async def create_memory_master(memory_master: MemoryMasterCreate, db: DbSession = Depends(get_session)):
+    response = await call(memory_masters.create, db, memory_master)
     return response
 
+@router.post("/memory_masters/bulk", response_model=BulkResult, dependencies=[Depends(JWTBearer())], tags=["Memory Masters"])
+async def bulk_create_memory_masters(rows: list[dict] = Depends(read_bulk_rows), batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=5000), db: DbSession = Depends(get_session)):
+    return await call(memory_masters.bulk_create, db, rows, batch_size)
+
+@router.get("/memory_masters/export", dependencies=[Depends(JWTBearer())], tags=["Memory Masters"])
+async def export_memory_masters(format: ExportFormat = "ndjson"):
+    return export_response(stream_rows(MEMORY_MASTER_COLUMNS, format), "memory_masters", format)
+
 @router.get("/memory_masters/{memory_master_id}", response_model=MemoryMaster, dependencies=[Depends(JWTBearer())], tags=["Memory Masters"])
-def read_memory_master(memory_master_id: int, db: Session = Depends(get_db)):
-    response = memory_masters.get(db, memory_master_id)
+async def read_memory_master(request: Request, response: Response, memory_master_id: int, expand: Optional[str] = None, db: DbSession = Depends(get_session)):
+    expanded = parse_expand(expand, MEMORY_MASTER_EXPANSIONS)
+    if expanded:
+        response_row = await call(memory_masters.get, db, memory_master_id, options=memory_master_options(expanded))
+        if response_row is None:
+            raise HTTPException(status_code=404, detail="Memory Master not found")
+        return expanded_response(response_row, MemoryMasterExpanded, expanded, MEMORY_MASTER_EXPANSIONS)
+    not_modified = conditional_response(request, response, await call(memory_masters.version_cached, db, memory_master_id))
+    if not_modified:
+        return not_modified
+    response_row = await call(memory_masters.get_cached, db, memory_master_id)
+    if response_row is None:
+        raise HTTPException(status_code=404, detail="Memory Master not found")
+    return response_row
+
+@router.put("/memory_masters/{memory_master_id}", response_model=MemoryMaster, dependencies=[Depends(JWTBearer())], tags=["Memory Masters"])
+async def update_memory_master(memory_master_id: int, memory_master_update: MemoryMasterUpdate, db: DbSession = Depends(get_session)):
+    response = await call(memory_masters.update, db, memory_master_id, memory_master_update)
     if response is None:
         raise HTTPException(status_code=404, detail="Memory Master not found")
     return response
 
-@router.put("/memory_masters/{memory_master_id}", response_model=MemoryMaster, dependencies=[Depends(JWTBearer())], tags=["Memory Masters"])
-def update_memory_master(memory_master_id: int, memory_master_update: MemoryMasterUpdate, db: Session = Depends(get_db)):
-    response = memory_masters.update(db, memory_master_id, memory_master_update)
+@router.patch("/memory_masters/{memory_master_id}", response_model=MemoryMaster, dependencies=[Depends(JWTBearer())], tags=["Memory Masters"])
+async def patch_memory_master(memory_master_id: int, memory_master_patch: MemoryMasterPatch, db: DbSession = Depends(get_session)):
+    response = await call(memory_masters.update, db, memory_master_id, memory_master_patch)
     if response is None:
         raise HTTPException(status_code=404, detail="Memory Master not found")
     return response
 
 @router.delete("/memory_masters/{memory_master_id}", response_model=MemoryMaster, dependencies=[Depends(JWTBearer())], tags=["Memory Masters"])
-def delete_memory_master(memory_master_id: int, db: Session = Depends(get_db)):
-    response = memory_masters.delete(db, memory_master_id)
+async def delete_memory_master(memory_master_id: int, db: DbSession = Depends(get_session)):
+    response = await call(memory_masters.delete, db, memory_master_id)
     if response is None:
         raise HTTPException(status_code=404, detail="Memory Master not found")
     return response
 
+@router.get("/pool/stats", dependencies=[Depends(JWTBearer())], tags=["Monitoring"])
+def get_pool_stats():
+    return pool_stats()
+
+# Remaining capacity per speciality and unassigned students, from the maintained counters
+@router.get("/stats", response_model=Stats, dependencies=[Depends(JWTBearer()), Depends(require_admin)], tags=["Stats"])
+async def get_stats(exact: bool = False, db: DbSession = Depends(get_session)):
+    return await call(stats.get, db, exact)
+
+@router.post("/stats/rebuild", response_model=Stats, dependencies=[Depends(JWTBearer()), Depends(require_admin)], tags=["Stats"])
+async def rebuild_stats(db: DbSession = Depends(get_session)):
+    return await call(stats.rebuild, db)
 
 # Admin routes for choosing supervisors and memory masters to a student
 # @router.post("/students/{student_id}/choose_supervisor/{supervisor_id}", response_model=Student, dependencies=[Depends(JWTBearer())], tags=["Admin"])
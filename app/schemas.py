@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Literal, Optional
 
 class Token(BaseModel):
     access_token: str
@@ -37,8 +37,19 @@ class Student(StudentBase):
     class Config:
         from_attributes = True
         
-class StudentUpdate(StudentBase):
-    pass 
+# PATCH bodies: only the fields sent are updated. Assignments are not editable here, they go
+# through the choose/change endpoints that claim availability.
+class StudentPatch(BaseModel):
+    full_name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    is_active: Optional[int] = None
+    is_admin: Optional[int] = None
+    password: Optional[str] = None  # rehashed only when present
+
+# PUT bodies: the required fields of a create, optional ones left unchanged when omitted
+class StudentUpdate(StudentPatch):
+    full_name: str
+    email: EmailStr
 
 class SupervisorBase(BaseModel):
     full_name: str
@@ -56,6 +67,10 @@ class Supervisor(SupervisorBase):
         
 class SupervisorUpdate(SupervisorBase):
     pass
+
+class SupervisorPatch(BaseModel):
+    full_name: Optional[str] = None
+    speciality: Optional[str] = None
         
 class MemoryMasterBase(BaseModel):
     full_name: str
@@ -73,6 +88,79 @@ class MemoryMaster(MemoryMasterBase):
         
 class MemoryMasterUpdate(MemoryMasterBase):
     pass
+
+class MemoryMasterPatch(BaseModel):
+    full_name: Optional[str] = None
+    speciality: Optional[str] = None
         
     
 
+class BulkError(BaseModel):
+    row: int  # 0-based position in the submitted array or CSV (header excluded)
+    detail: str
+
+class BulkResult(BaseModel):
+    created: int
+    errors: list[BulkError] = []
+        
+class StudentExpanded(Student):
+    supervisor: Optional[Supervisor] = None
+    memory_master: Optional[MemoryMaster] = None
+
+class SupervisorExpanded(Supervisor):
+    students: list[Student] = []
+
+class MemoryMasterExpanded(MemoryMaster):
+    students: list[Student] = []
+        
+CatalogSort = Literal["id", "-id", "full_name", "-full_name", "speciality", "-speciality", "availability", "-availability"]
+StudentSort = Literal["id", "-id", "full_name", "-full_name", "email", "-email"]
+
+class CatalogFilters(BaseModel):
+    speciality: list[str] = []  # one value for equality, several for IN
+    available: Optional[bool] = None
+    search: Optional[str] = None  # full_name prefix
+    sort: CatalogSort = "id"
+
+class StudentFilters(BaseModel):
+    supervisor_id: Optional[int] = None
+    memory_master_id: Optional[int] = None
+    has_supervisor: Optional[bool] = None
+    has_memory_master: Optional[bool] = None
+    search: Optional[str] = None  # full_name prefix
+    sort: StudentSort = "id"
+        
+class StudentPreferences(BaseModel):
+    student_id: int
+    supervisors: list[int] = []  # ranked, most preferred first
+    memory_masters: list[int] = []
+
+class MatchingRequest(BaseModel):
+    preferences: list[StudentPreferences]  # earlier students have priority on contested places
+    dry_run: bool = False
+
+class MatchingAssignment(BaseModel):
+    student_id: int
+    supervisor_id: Optional[int] = None
+    memory_master_id: Optional[int] = None
+
+class MatchingResult(BaseModel):
+    supervisors_assigned: int
+    memory_masters_assigned: int
+    unmatched: list[int] = []  # students left without one of their requested assignments
+    unknown_students: list[int] = []
+    assignments: list[MatchingAssignment] = []
+        
+
+class SpecialityStats(BaseModel):
+    speciality: str
+    supervisors: int = 0
+    supervisor_capacity: int = 0  # places left, the sum of availability
+    memory_masters: int = 0
+    memory_masters_available: int = 0
+
+class Stats(BaseModel):
+    students: int = 0
+    students_without_supervisor: int = 0
+    students_without_memory_master: int = 0
+    specialities: list[SpecialityStats] = []
@@ -0,0 +1,49 @@
+import math
+import os
+
+# Multi-worker entry point:  python serve.py
+# Migrates the database once, then starts WEB_CONCURRENCY uvicorn worker processes on HOST:PORT,
+# one per available core unless set. Workers inherit the environment, so the worker count seen by
+# database.shared_backend and the per-process defaults (hashing pool, role cache) is this one.
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+# Proxies trusted to set X-Forwarded-For: requests coming from them get the client address it
+# carries (the per-IP rate limits need it), taken right to left past the trusted hops.
+# Comma-separated IPs or networks, "*" for any peer.
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Cores this process may run on, capped by a container CPU quota (cgroup v2 cpu.max)
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as file:
+            quota, period = file.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+def main():
+    # Before importing the app: its modules read the environment on import
+    os.environ.setdefault("WEB_CONCURRENCY", str(available_cpus()))
+    import uvicorn
+    from database import WEB_CONCURRENCY, env_flag, get_engine
+    from migrate import upgrade
+
+    if env_flag("DB_AUTO_MIGRATE", "1"):
+        engine = get_engine()
+        with engine.begin() as connection:
+            upgrade(connection)
+        engine.dispose()
+    os.environ["DB_AUTO_MIGRATE"] = "0"  # done once here, not by every worker
+    uvicorn.run(
+        "main:app", host=HOST, port=PORT, workers=WEB_CONCURRENCY,
+        proxy_headers=True, forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+    )
+
+if __name__ == "__main__":
+    main()
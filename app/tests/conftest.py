@@ -0,0 +1,22 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from bench.seed import memory_session_factory, seed
+
+# A SQLite file, for tests running sessions on several connections at once
+@pytest.fixture
+def file_session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False, "timeout": 30}, pool_size=16)
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+# In-memory listings of a few thousand rows over 40 specialities, seeded once for the query tests
+@pytest.fixture(scope="session")
+def seeded():
+    session_factory = memory_session_factory()
+    seed(session_factory, supervisors=2000, students=8000, specialities=40)
+    yield session_factory
+    session_factory.kw["bind"].dispose()
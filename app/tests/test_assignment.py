@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from bench.seed import seed
+from crud import students
+from models import Student, Supervisor
+
+STUDENTS = 100
+CAPACITY = 10
+
+# Every student grabs a place of the same supervisor at once: no more than its capacity is handed out
+def test_choose_supervisor_never_over_allocates(file_session_factory):
+    seed(file_session_factory, supervisors=1, students=STUDENTS, capacity=CAPACITY, assigned=False)
+
+    def attempt(student_id: int) -> bool:
+        with file_session_factory() as db:
+            try:
+                students.choose_supervisor(db, student_id, 1)
+                return True
+            except HTTPException:
+                return False
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        granted = sum(pool.map(attempt, range(1, STUDENTS + 1)))
+
+    with file_session_factory() as db:
+        assigned = db.scalar(select(func.count()).select_from(Student).where(Student.supervisor_id == 1))
+        availability = db.scalar(select(Supervisor.availability).where(Supervisor.id == 1))
+    assert (granted, assigned, availability) == (CAPACITY, CAPACITY, 0)
@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import event
+
+from crud import students, supervisors
+from crud.relations import STUDENT_EXPANSIONS, student_options, supervisor_options
+from schemas import StudentExpanded, SupervisorExpanded
+
+LISTINGS = {
+    "students": lambda db, limit: [
+        StudentExpanded.model_validate(row) for row in students.get_all(db, limit=limit, options=student_options(set(STUDENT_EXPANSIONS)))],
+    "supervisors": lambda db, limit: [
+        SupervisorExpanded.model_validate(row) for row in supervisors.get_all(db, limit=limit, options=supervisor_options({"students"}))],
+}
+
+def count_queries(session_factory, load) -> int:
+    engine = session_factory.kw["bind"]
+    statements = []
+    record = lambda *_: statements.append(None)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with session_factory() as db:
+            load(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return len(statements)
+
+# Serializing the relations of an expanded page costs the same queries whatever its size, up to
+# the 500 ids selectinload puts in one IN query
+@pytest.mark.parametrize("name", LISTINGS)
+def test_expanded_query_count_does_not_grow_with_page_size(seeded, name):
+    counts = {count_queries(seeded, lambda db: LISTINGS[name](db, limit)) for limit in (10, 100, 500)}
+    assert len(counts) == 1
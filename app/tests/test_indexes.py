@@ -0,0 +1,15 @@
+import pytest
+
+from bench.explain_indexes import CASES, explain
+
+@pytest.fixture(scope="module")
+def analyzed(seeded):
+    with seeded.kw["bind"].connect() as connection:
+        connection.exec_driver_sql("ANALYZE")
+    return seeded
+
+# Each filtered listing is served by the index added for it
+@pytest.mark.parametrize("listing, index", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_filtered_listing_uses_its_index(analyzed, listing, index):
+    plan = explain(analyzed, listing)
+    assert any(index in step for step in plan), plan